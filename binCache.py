@@ -0,0 +1,179 @@
+"""
+    CDNSim
+
+file: binCache.py
+
+    NEC Europe Ltd. PROPRIETARY INFORMATION
+
+This software is supplied under the terms of a license agreement
+or nondisclosure agreement with NEC Europe Ltd. and may not be
+copied or disclosed except in accordance with the terms of that
+agreement. The software and its source code contain valuable trade
+secrets and confidential information which have to be maintained in
+confidence.
+Any unauthorized publication, transfer to third parties or duplication
+of the object or source code - either totally or in part - is
+prohibited.
+
+    Copyright (c) 2016 NEC Europe Ltd. All Rights Reserved.
+
+Author: Anton Ivanov <anton.ivanov@neclab.eu>
+
+NEC Europe Ltd. DISCLAIMS ALL WARRANTIES, EITHER EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO IMPLIED WARRANTIES OF MERCHANTABILITY
+AND FITNESS FOR A PARTICULAR PURPOSE AND THE WARRANTY AGAINST LATENT
+DEFECTS, WITH RESPECT TO THE PROGRAM AND THE ACCOMPANYING
+DOCUMENTATION.
+
+No Liability For Consequential Damages IN NO EVENT SHALL NEC Europe
+Ltd., NEC Corporation OR ANY OF ITS SUBSIDIARIES BE LIABLE FOR ANY
+DAMAGES WHATSOEVER (INCLUDING, WITHOUT LIMITATION, DAMAGES FOR LOSS
+OF BUSINESS PROFITS, BUSINESS INTERRUPTION, LOSS OF INFORMATION, OR
+OTHER PECUNIARY LOSS AND INDIRECT, CONSEQUENTIAL, INCIDENTAL,
+ECONOMIC OR PUNITIVE DAMAGES) ARISING OUT OF THE USE OF OR INABILITY
+TO USE THIS PROGRAM, EVEN IF NEC Europe Ltd. HAS BEEN ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGES.
+
+    THIS HEADER MAY NOT BE EXTRACTED OR MODIFIED IN ANY WAY.
+"""
+
+
+import hashlib
+import struct
+import json
+import os
+
+import numpy
+
+#   single-file container: magic, format version, JSON header (metadata and
+#   the layout of every array), then the raw arrays, each 64-byte aligned so
+#   that it can be memory-mapped in place
+MAGIC = 'CDNSIMBC'
+FORMAT_VERSION = 1
+ALIGN = 64
+
+
+def fileDigest(fileName):
+    if not os.path.isfile(fileName):
+        return None
+    digest = hashlib.sha1()
+    f = open(fileName, 'rb')
+    for chunk in iter(lambda: f.read(1 << 20), ''):
+        digest.update(chunk)
+    f.close()
+    return digest.hexdigest()
+
+
+class digestStore:
+
+    #   file digests kept in a JSON file and reused as long as the size and
+    #   the modification time of the file are unchanged
+
+    def __init__(self, fileName):
+        self.fileName = fileName
+        self.entries = dict()
+        self.changed = False
+        if os.path.isfile(fileName):
+            try:
+                with open(fileName, 'r') as f:
+                    self.entries = json.load(f)
+            except ValueError:
+                self.entries = dict()
+        return
+
+    def digest(self, fileName):
+        if not os.path.isfile(fileName):
+            return None
+        st = os.stat(fileName)
+        key = os.path.abspath(fileName)
+        entry = self.entries.get(key)
+        if entry is not None and entry[:2] == [st.st_size, st.st_mtime]:
+            return entry[2]
+        digest = fileDigest(fileName)
+        self.entries[key] = [st.st_size, st.st_mtime, digest]
+        self.changed = True
+        return digest
+
+    def save(self):
+        if not self.changed:
+            return
+        tmpName = self.fileName + '.tmp'
+        with open(tmpName, 'w') as f:
+            json.dump(self.entries, f)
+        os.rename(tmpName, self.fileName)
+        self.changed = False
+        return
+
+
+def write(fileName, meta, arrays):
+    layout = []
+    offset = 0
+    for name in sorted(arrays):
+        arr = numpy.ascontiguousarray(arrays[name])
+        arrays[name] = arr
+        layout.append({
+            'name': name,
+            'dtype': arr.dtype.str,
+            'shape': list(arr.shape),
+            'offset': offset
+        })
+        offset += (arr.nbytes + ALIGN - 1) // ALIGN * ALIGN
+    header = json.dumps({'meta': meta, 'arrays': layout})
+    dataStart = len(MAGIC) + 8 + len(header)
+    dataStart = (dataStart + ALIGN - 1) // ALIGN * ALIGN
+    # write to a temporary file first, an interrupted run
+    # must not leave a truncated cache behind
+    tmpName = fileName + '.tmp'
+    f = open(tmpName, 'wb')
+    f.write(MAGIC)
+    f.write(struct.pack('<II', FORMAT_VERSION, len(header)))
+    f.write(header)
+    for entry in layout:
+        f.seek(dataStart + entry['offset'])
+        f.write(arrays[entry['name']].tostring())
+    f.close()
+    os.rename(tmpName, fileName)
+    return
+
+
+def readHeader(fileName):
+    #   returns (metadata, array layout, data offset) or
+    #   None if the file is missing or was written by another format version
+    if not os.path.isfile(fileName):
+        return None
+    f = open(fileName, 'rb')
+    try:
+        if f.read(len(MAGIC)) != MAGIC:
+            return None
+        version, headerLen = struct.unpack('<II', f.read(8))
+        if version != FORMAT_VERSION:
+            return None
+        header = json.loads(f.read(headerLen))
+    finally:
+        f.close()
+    dataStart = len(MAGIC) + 8 + headerLen
+    dataStart = (dataStart + ALIGN - 1) // ALIGN * ALIGN
+    return header['meta'], header['arrays'], dataStart
+
+
+def read(fileName, mmap=True):
+    meta, layout, dataStart = readHeader(fileName)
+    arrays = dict()
+    for entry in layout:
+        dtype = numpy.dtype(str(entry['dtype']))
+        shape = tuple(entry['shape'])
+        offset = dataStart + entry['offset']
+        if numpy.prod(shape) == 0:
+            arrays[entry['name']] = numpy.empty(shape, dtype=dtype)
+        elif mmap:
+            arrays[entry['name']] = numpy.memmap(
+                fileName, dtype=dtype, mode='r', offset=offset, shape=shape
+            )
+        else:
+            f = open(fileName, 'rb')
+            f.seek(offset)
+            arrays[entry['name']] = numpy.fromfile(
+                f, dtype=dtype, count=int(numpy.prod(shape))
+            ).reshape(shape)
+            f.close()
+    return meta, arrays
@@ -37,67 +37,129 @@ POSSIBILITY OF SUCH DAMAGES.
     THIS HEADER MAY NOT BE EXTRACTED OR MODIFIED IN ANY WAY.
 """
 
-import networkx
+import array
 
 import sim_globals as sg
 import sim_event as se
 import netDataStream as ns
+from streamList import streamList
+
+
+class asCacheStats:
+
+    #   per-AS cache counters (current and maximal throughput, connections
+    #   and number of VMs), indexed like the topology index 'asIndex'
+
+    def __init__(self, nASes):
+        self.curThroughput = array.array('d', [0.0]) * nASes
+        self.maxThroughput = array.array('d', [0.0]) * nASes
+        self.curConnections = array.array('l', [0]) * nASes
+        self.maxConnections = array.array('l', [0]) * nASes
+        self.curNumVMs = array.array('l', [0]) * nASes
+        self.maxNumVMs = array.array('l', [0]) * nASes
+        return
+
+    def addVM(self, i):
+        self.curNumVMs[i] += 1
+        if self.curNumVMs[i] > self.maxNumVMs[i]:
+            self.maxNumVMs[i] = self.curNumVMs[i]
+        return
+
+    def addConnections(self, i, n):
+        self.curConnections[i] += n
+        if self.curConnections[i] > self.maxConnections[i]:
+            self.maxConnections[i] = self.curConnections[i]
+        return
+
+    def addThroughput(self, i, delta):
+        self.curThroughput[i] += delta
+        if self.curThroughput[i] > self.maxThroughput[i]:
+            self.maxThroughput[i] = self.curThroughput[i]
+        return
+
+
+class cacheRegistry:
+
+    #   cache VMs by (AS, channel), kept out of the topology graph, and the
+    #   per-channel cache request counters that trigger their creation
+
+    def __init__(self):
+        self.vms = dict()
+        self.nRequests = dict()
+        self.cacheASes = set()  # ASes that ever had a VM
+        return
+
+    def get(self, ASn, channel):
+        return self.vms.get((ASn, channel))
+
+    def add(self, ASn, channel, cache):
+        self.vms[(ASn, channel)] = cache
+        self.cacheASes.add(ASn)
+        return
+
+    def remove(self, ASn, channel):
+        del self.vms[(ASn, channel)]
+        self.nRequests[(ASn, channel)] = 0
+        return
+
+    def countRequest(self, ASn, channel):
+        key = (ASn, channel)
+        n = self.nRequests.get(key, 0) + 1
+        self.nRequests[key] = n
+        return n
 
 
 class cacheNode:
 
     #   originally cacheNode was intended to mimic a server (hardware entity),
-    #   however with time it became in some sense a virtual machine as we
-    #   create more than one cacheNode entity for every AS, however
-    #   for the reason of backward compatibility we still keep the old structure
-    #   of the cacheNode to be able to mimic a server (one entity per AS)
-    #   this means that strs_cnl_rate[STREAM_RATE][CHANNEL_NUMBER][STREAM] list
-    #   is only partially used; e.g. one CHANNEL_NUMBER per VM
-
-    def __init__(self, ASNum):
+    #   however with time it became in some sense a virtual machine: one
+    #   cacheNode serves one channel of one AS. Its cache streams and the
+    #   lists of dependent streams are therefore indexed by the stream rate
+    #   ID only
+
+    def __init__(self, ASNum, channel):
         self.id = sg.globalCacheID
         sg.globalCacheID += 1
         self.ASnum = ASNum
+        self.asIdx = sg.gnGraph.asIndex[ASNum]
+        # hops to the content provider
+        self.depth = int(sg.gnGraph.asDepth[self.asIdx])
+        self.asStats = sg.urRef.asStats
+        self.channel = channel
         self.ready = False
         self.waitingStreams = []
-        # how to access the list of Streams Per Channel Per Rate
-        # strs_cnl_rate[STREAM_RATE][CHANNEL_NUMBER][STREAM]
-        self.cacheStreams = [None] * len(sg.STREAM_RATES) * sg.NUMBER_CHANNELS
-        self.strs_cnl_rate = [None] * len(sg.STREAM_RATES)
+        # cacheStreams[rateID], dependentStreams[rateID][STREAM]
+        self.cacheStreams = [None] * len(sg.STREAM_RATES)
+        self.dependentStreams = [None] * len(sg.STREAM_RATES)
+        # streams started by a pending EVENT_START_DEPENDENTS, by event id
+        self.pendingStarts = dict()
         self.numStreamsConnected = 0
         self.currentThroughput = 0.0
         self.stats_maxThroughput_vm = 0
         self.stats_maxConnections_vm = 0
-        for j in range(len(sg.STREAM_RATES)):
-            self.strs_cnl_rate[j] = dict()
         return
 
     def attachNetDataStream(self, stream, curTime):
         if self.ready:
             # attach a stream to the cache instance:
             # a cache stream is created, 'stream' is added as dependent stream
-            sRateID = sg.STREAM_RATES.index(stream.consumeRate)
-            cacheStreamID = sRateID * sg.NUMBER_CHANNELS + stream.channel
-            if stream.channel in self.strs_cnl_rate[sRateID]:
+            sRateID = stream.rateID
+            if self.dependentStreams[sRateID] is not None:
                 # we have channel with this rate in cache
-                self.strs_cnl_rate[sRateID][stream.channel].append(
-                    stream
-                )
+                self.dependentStreams[sRateID].append(stream)
             else:
-                self.strs_cnl_rate[sRateID][stream.channel] = [stream]
-            if self.cacheStreams[cacheStreamID] is None:
-                # FIXME: use ip-address as the dest ip instead...
+                self.dependentStreams[sRateID] = streamList([stream])
+            if self.cacheStreams[sRateID] is None:
                 cSt = ns.netDataStream(
                     stream.consumeRate,
                     stream.srcIP,
-                    'cache@'+str(self.ASnum),
+                    None,
                     0,
                     stream.channel,
                     sg.STREAM_CACHE
                 )
                 cSt.downCacheRef = self
-                path = networkx.shortest_path(
-                    sg.gnGraph.netGraph,
+                path, links = sg.gnGraph.routes.getRoute(
                     self.ASnum,
                     sg.gnGraph.ip2as[cSt.srcIP]
                 )
@@ -106,15 +168,16 @@ class cacheNode:
                     # on-demand instantiations are not allowed -> 'first=False'
                     sg.urRef.routeStreamPath_inclCache(
                         path,
+                        links,
                         cSt,
                         curTime,
                         first=False
                     )
                 else:
-                    sg.urRef.routeStreamPath(path, cSt, curTime)
-                self.cacheStreams[cacheStreamID] = cSt
+                    sg.urRef.routeStreamPath(path, links, cSt, curTime)
+                self.cacheStreams[sRateID] = cSt
             else:
-                cSt = self.cacheStreams[cacheStreamID]
+                cSt = self.cacheStreams[sRateID]
                 if cSt.beingConsumed:
                     sg.simRef.eventPush(
                         se.event(
@@ -133,31 +196,26 @@ class cacheNode:
             stream.upCacheRef = self
             stream.connectedToCache = True
             #   Update stats
-            thisAS = sg.gnGraph.netGraph.node[self.ASnum]
-            thisAS['cur_Connections'] += 1
+            self.asStats.addConnections(self.asIdx, 1)
             self.numStreamsConnected += 1
             if self.numStreamsConnected > self.stats_maxConnections_vm:
                 self.stats_maxConnections_vm = self.numStreamsConnected
-            if thisAS['cur_Connections'] > thisAS['stats_maxConnections']:
-                thisAS['stats_maxConnections'] = thisAS['cur_Connections']
 
         return True
 
     def detachNetDataStream(self, stream, curTime):
-        sRateID = sg.STREAM_RATES.index(stream.consumeRate)
-        self.strs_cnl_rate[sRateID][stream.channel].remove(stream)
+        sRateID = stream.rateID
+        self.dependentStreams[sRateID].remove(stream)
         self.numStreamsConnected -= 1
-        thisAS = sg.gnGraph.netGraph.node[self.ASnum]
-        thisAS['cur_Connections'] -= 1
+        self.asStats.addConnections(self.asIdx, -1)
         stream.upCacheRef = None
-        cacheStreamID = sRateID * sg.NUMBER_CHANNELS + stream.channel
-        if len(self.strs_cnl_rate[sRateID][stream.channel]) == 0:
+        if len(self.dependentStreams[sRateID]) == 0:
             # stop downloading, if there are no consumers
-            cSt = self.cacheStreams[cacheStreamID]
-            self.cacheStreams[cacheStreamID] = None
+            cSt = self.cacheStreams[sRateID]
+            self.cacheStreams[sRateID] = None
             cEv = se.event(curTime, id(cSt), sg.EVENT_STREAM_COMPLETED)
             cSt.process(cEv)
-            if 'static_cache' not in thisAS:
+            if not sg.gnGraph.asHasStaticCache[self.asIdx]:
                 if self.numStreamsConnected == 0:
                     sg.simRef.cacheStatistics_vm.append((
                         self.ASnum,
@@ -165,10 +223,8 @@ class cacheNode:
                         self.stats_maxThroughput_vm,
                         self.stats_maxConnections_vm
                     ))
-                    sg.gnGraph.netGraph.remove_node(self.id)
-                    # delete old cache node not to crowd up the topology
-                    thisAS['caches'][stream.channel] = None
-                    thisAS['nCacheRequests'][stream.channel] = 0
+                    # delete the idle VM
+                    sg.urRef.caches.remove(self.ASnum, self.channel)
                     del sg.event_obj_dict[id(self)]
         return
 
@@ -176,51 +232,46 @@ class cacheNode:
         cacheStream.updateCounters(curTime)
         cacheStream.beingConsumed = True
         cacheStream.consumePoint = curTime
-        channel = cacheStream.channel
-        sRateID = sg.STREAM_RATES.index(cacheStream.consumeRate)
-        for stream in self.strs_cnl_rate[sRateID][channel]:
-            if not stream.beingTransmitted:
-                sg.simRef.eventPush(
-                    se.event(
-                        curTime + sg.PROPAGATION_DELAY,
-                        id(stream),
-                        sg.EVENT_STREAM_START,
-                        stream
-                    )
-                )
+        # one event starts all waiting dependents, in the order
+        # their own EVENT_STREAM_START events would have fired
+        streams = [stream
+                   for stream in self.dependentStreams[cacheStream.rateID]
+                   if not stream.beingTransmitted]
+        if streams:
+            ev = se.event(
+                curTime + sg.PROPAGATION_DELAY,
+                id(self),
+                sg.EVENT_START_DEPENDENTS,
+                self
+            )
+            self.pendingStarts[ev.eid] = streams
+            sg.simRef.eventPush(ev)
         return
 
     def getParentCacheStreamTransmitRate(self, stream):
-        channel = stream.channel
-        sRateID = sg.STREAM_RATES.index(stream.consumeRate)
-        cSt = self.cacheStreams[sRateID * sg.NUMBER_CHANNELS + channel]
-        return cSt.transmitRate
+        return self.cacheStreams[stream.rateID].transmitRate
 
     def getParentCacheStreamBufferSize(self, stream, curTime):
-        channel = stream.channel
-        sRateID = sg.STREAM_RATES.index(stream.consumeRate)
-        cSt = self.cacheStreams[sRateID * sg.NUMBER_CHANNELS + channel]
+        cSt = self.cacheStreams[stream.rateID]
         cSt.updateCounters(curTime)
         inBuffer = float(cSt.downloadedBit - cSt.consumedBit)
         return inBuffer
 
     def updateDependentStreams(self, cacheStream, curTime):
-        channel = cacheStream.channel
-        sRateID = sg.STREAM_RATES.index(cacheStream.consumeRate)
-        for stream in self.strs_cnl_rate[sRateID][channel]:
+        # live dependents are capped by the rate of the cache stream,
+        # which does not change while they are re-rated
+        maxRate = cacheStream.transmitRate
+        for stream in self.dependentStreams[cacheStream.rateID]:
             if stream.transmitingLive:
-                stream.tryUseMaxTRate(curTime)
+                stream.tryUseMaxTRate(curTime, maxRate)
         return
 
     def updateThroughputStats(self, old_tr, new_tr):
         #   Update stats
         self.currentThroughput += new_tr - old_tr
-        thisAS = sg.gnGraph.netGraph.node[self.ASnum]
-        thisAS['cur_Throughput'] += new_tr - old_tr
+        self.asStats.addThroughput(self.asIdx, new_tr - old_tr)
         if self.currentThroughput > self.stats_maxThroughput_vm:
             self.stats_maxThroughput_vm = self.currentThroughput
-        if thisAS['cur_Throughput'] > thisAS['stats_maxThroughput']:
-            thisAS['stats_maxThroughput'] = thisAS['cur_Throughput']
         return
 
     def process(self, ev):
@@ -229,6 +280,11 @@ class cacheNode:
             for s in self.waitingStreams:
                 self.attachNetDataStream(s, ev.time)
             self.waitingStreams = []
+        elif ev.type == sg.EVENT_START_DEPENDENTS:
+            for stream in self.pendingStarts.pop(ev.eid):
+                stream.process(
+                    se.event(ev.time, id(stream), sg.EVENT_STREAM_START)
+                )
         else:
             raise Exception("Unknown event type:" + str(ev.type))
-        return
\ No newline at end of file
+        return
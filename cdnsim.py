@@ -72,6 +72,9 @@ def main(argv=None):
     inFilesGr.add_argument('-rank', metavar='file',
                            default='caida.org.dat',
                            help='CAIDA AS rank data')
+    inFilesGr.add_argument('-workload', metavar='file',
+                           default='',
+                           help='Replay user requests saved by -saveWorkload')
 
     simSetupGr = parser.add_argument_group('Simulation setup')
     simSetupGr.add_argument('-geo', metavar='string',
@@ -124,6 +127,20 @@ def main(argv=None):
     simSetupGr.add_argument('-unlimCoreLinkBandwidth', action='store_true',
                             default=False,
                             help='Set no limit to the core link bandwidth')
+    simSetupGr.add_argument('-eventQueue', metavar='type',
+                            choices=['treap', 'heap', 'calendar'],
+                            default='treap',
+                            help='Event queue: treap | heap | calendar')
+    simSetupGr.add_argument('-reallocation', metavar='mode',
+                            choices=['polling', 'event'], default='polling',
+                            help='Bandwidth reallocation: polling | event')
+    simSetupGr.add_argument('-streamTimers', metavar='mode',
+                            choices=['all', 'single'], default='all',
+                            help='Queued stream timers: all | single '
+                                 '(earliest per stream)')
+    simSetupGr.add_argument('-routeCache', metavar='number', type=int,
+                            default=10000,
+                            help='# memoized routes (not to the provider)')
     resultsGr = parser.add_argument_group('Results')
     resultsGr.add_argument('-siminfo', metavar='text',
                            default='',
@@ -137,6 +154,12 @@ def main(argv=None):
     resultsGr.add_argument('-parallel', action='store_true',
                            default=False,
                            help='Enable parallelism in simulation')
+    resultsGr.add_argument('-recordEvents', metavar='file',
+                           default='',
+                           help='Record event queue operations')
+    resultsGr.add_argument('-saveWorkload', metavar='file',
+                           default='',
+                           help='Save the user requests for -workload')
 
     args = parser.parse_args(argv)
 
@@ -180,6 +203,11 @@ def main(argv=None):
 
     sg.gnGraph.initContentProviders()
 
+    printWithClock("Building the topology and routing index")
+    sg.gnGraph.buildTopologyIndex()
+    import netRoutes
+    sg.gnGraph.routes = netRoutes.routeService(sg.gnGraph, args.routeCache)
+
     import hl_sim
     simulator = hl_sim.highLevelSimulation()
     sg.simRef = simulator
@@ -204,25 +232,31 @@ def main(argv=None):
         e = sg.urRef.getNoiseEvent(simulator.lastEventTime)
     else:
         e = sg.urRef.getNextEvent(simulator.lastEventTime)
-    simulator.eventPush(e)
+    if e is not None:
+        simulator.eventPush(e)
 
     # main simulation loop
     while simulator.step():
         pass
+    if args.recordEvents != '' and not args.parallel:
+        simulator.eventQueue.close()
 
     stop = time.time()
     print("")
     printWithClock("Simulation completed on: " +
                    time.strftime('%Y.%m.%d-%H.%M.%S'))
     printWithClock("Time spent (s): " + str(stop-start))
+    printWithClock("Routing: " + sg.gnGraph.routes.getStats())
+    sg.urRef.saveWorkload()
 
-    for ASnum, ASnode in sg.gnGraph.netGraph.nodes_iter(data=True):
-        if 'caches' in ASnode:
+    asStats = sg.urRef.asStats
+    for i, ASnum in enumerate(sg.gnGraph.asNums.tolist()):
+        if ASnum in sg.urRef.caches.cacheASes:
             simulator.cacheStatistics_hw.append((
                 ASnum,
-                ASnode['stats_maxThroughput'],
-                ASnode['stats_maxConnections'],
-                ASnode['stats_max_NumVMs']
+                asStats.maxThroughput[i],
+                asStats.maxConnections[i],
+                asStats.maxNumVMs[i]
             ))
 
     simResDirName = 'sim_res' + args.siminfo + '-' + simTimeStamp
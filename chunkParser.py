@@ -0,0 +1,134 @@
+"""
+    CDNSim
+
+file: chunkParser.py
+
+    NEC Europe Ltd. PROPRIETARY INFORMATION
+
+This software is supplied under the terms of a license agreement
+or nondisclosure agreement with NEC Europe Ltd. and may not be
+copied or disclosed except in accordance with the terms of that
+agreement. The software and its source code contain valuable trade
+secrets and confidential information which have to be maintained in
+confidence.
+Any unauthorized publication, transfer to third parties or duplication
+of the object or source code - either totally or in part - is
+prohibited.
+
+    Copyright (c) 2016 NEC Europe Ltd. All Rights Reserved.
+
+Author: Anton Ivanov <anton.ivanov@neclab.eu>
+
+NEC Europe Ltd. DISCLAIMS ALL WARRANTIES, EITHER EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO IMPLIED WARRANTIES OF MERCHANTABILITY
+AND FITNESS FOR A PARTICULAR PURPOSE AND THE WARRANTY AGAINST LATENT
+DEFECTS, WITH RESPECT TO THE PROGRAM AND THE ACCOMPANYING
+DOCUMENTATION.
+
+No Liability For Consequential Damages IN NO EVENT SHALL NEC Europe
+Ltd., NEC Corporation OR ANY OF ITS SUBSIDIARIES BE LIABLE FOR ANY
+DAMAGES WHATSOEVER (INCLUDING, WITHOUT LIMITATION, DAMAGES FOR LOSS
+OF BUSINESS PROFITS, BUSINESS INTERRUPTION, LOSS OF INFORMATION, OR
+OTHER PECUNIARY LOSS AND INDIRECT, CONSEQUENTIAL, INCIDENTAL,
+ECONOMIC OR PUNITIVE DAMAGES) ARISING OUT OF THE USE OF OR INABILITY
+TO USE THIS PROGRAM, EVEN IF NEC Europe Ltd. HAS BEEN ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGES.
+
+    THIS HEADER MAY NOT BE EXTRACTED OR MODIFIED IN ANY WAY.
+"""
+
+
+import multiprocessing
+import collections
+import gzip
+import bz2
+import os
+
+import numpy
+
+#   input files are parsed in chunks of about CHUNK_SIZE bytes, each chunk
+#   ends on a line boundary. A parser is a module-level function
+#   'parser(text, *params)' returning a dict of equally long numpy columns;
+#   the columns of all chunks are concatenated in the file order
+CHUNK_SIZE = 8 << 20
+#   chunks submitted to the pool and not collected yet, per process: a
+#   compressed input is decompressed only this far ahead of the parsers
+CHUNKS_IN_FLIGHT = 2
+
+
+def openInput(fileName):
+    # compressed inputs are decompressed on the fly
+    if fileName.endswith('.gz'):
+        return gzip.open(fileName, 'rb')
+    elif fileName.endswith('.bz2'):
+        return bz2.BZ2File(fileName, 'rb')
+    return open(fileName, 'rb')
+
+
+def readRange(fileName, start, end):
+    #   the lines starting in the byte range [start, end)
+    f = open(fileName, 'rb')
+    if start > 0:
+        f.seek(start - 1)
+        f.readline()
+    pos = f.tell()
+    text = f.read(max(end - pos, 0)) if pos < end else ''
+    if text and not text.endswith('\n'):
+        text += f.readline()
+    f.close()
+    return text
+
+
+def readBlocks(fileName, chunkSize):
+    f = openInput(fileName)
+    while True:
+        text = f.read(chunkSize)
+        if not text:
+            break
+        if not text.endswith('\n'):
+            text += f.readline()
+        yield text
+    f.close()
+    return
+
+
+def parseChunk(args):
+    parser, params, text, fileRange = args
+    if fileRange is not None:
+        text = readRange(*fileRange)
+    return parser(text, *params)
+
+
+def parseFile(fileName, parser, params=(), nProcs=None,
+              chunkSize=CHUNK_SIZE):
+    if fileName.endswith('.gz') or fileName.endswith('.bz2'):
+        # a compressed stream cannot be split: the main process
+        # decompresses the blocks, the pool parses them
+        tasks = ((parser, params, text, None)
+                 for text in readBlocks(fileName, chunkSize))
+    else:
+        size = os.path.getsize(fileName)
+        tasks = [(parser, params, None, (fileName, start, start + chunkSize))
+                 for start in xrange(0, max(size, 1), chunkSize)]
+    if nProcs is None:
+        nProcs = multiprocessing.cpu_count()
+    if nProcs > 1 and (not isinstance(tasks, list) or len(tasks) > 1):
+        pool = multiprocessing.Pool(nProcs)
+        chunks = []
+        pending = collections.deque()
+        for task in tasks:
+            if len(pending) >= CHUNKS_IN_FLIGHT * nProcs:
+                chunks.append(pending.popleft().get())
+            pending.append(pool.apply_async(parseChunk, (task,)))
+        while pending:
+            chunks.append(pending.popleft().get())
+        pool.close()
+        pool.join()
+    else:
+        chunks = [parseChunk(task) for task in tasks]
+    if not chunks:
+        chunks = [parser('', *params)]
+    columns = dict()
+    for name in chunks[0]:
+        columns[name] = numpy.concatenate([c[name] for c in chunks])
+    return columns
@@ -0,0 +1,285 @@
+"""
+    CDNSim
+
+file: eventQueue.py
+
+    NEC Europe Ltd. PROPRIETARY INFORMATION
+
+This software is supplied under the terms of a license agreement
+or nondisclosure agreement with NEC Europe Ltd. and may not be
+copied or disclosed except in accordance with the terms of that
+agreement. The software and its source code contain valuable trade
+secrets and confidential information which have to be maintained in
+confidence.
+Any unauthorized publication, transfer to third parties or duplication
+of the object or source code - either totally or in part - is
+prohibited.
+
+    Copyright (c) 2016 NEC Europe Ltd. All Rights Reserved.
+
+Author: Anton Ivanov <anton.ivanov@neclab.eu>
+
+NEC Europe Ltd. DISCLAIMS ALL WARRANTIES, EITHER EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO IMPLIED WARRANTIES OF MERCHANTABILITY
+AND FITNESS FOR A PARTICULAR PURPOSE AND THE WARRANTY AGAINST LATENT
+DEFECTS, WITH RESPECT TO THE PROGRAM AND THE ACCOMPANYING
+DOCUMENTATION.
+
+No Liability For Consequential Damages IN NO EVENT SHALL NEC Europe
+Ltd., NEC Corporation OR ANY OF ITS SUBSIDIARIES BE LIABLE FOR ANY
+DAMAGES WHATSOEVER (INCLUDING, WITHOUT LIMITATION, DAMAGES FOR LOSS
+OF BUSINESS PROFITS, BUSINESS INTERRUPTION, LOSS OF INFORMATION, OR
+OTHER PECUNIARY LOSS AND INDIRECT, CONSEQUENTIAL, INCIDENTAL,
+ECONOMIC OR PUNITIVE DAMAGES) ARISING OUT OF THE USE OF OR INABILITY
+TO USE THIS PROGRAM, EVEN IF NEC Europe Ltd. HAS BEEN ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGES.
+
+    THIS HEADER MAY NOT BE EXTRACTED OR MODIFIED IN ANY WAY.
+"""
+
+import heapq
+import treap
+
+
+class treapEventQueue(object):
+    def __init__(self):
+        self.tree = treap.treap()
+
+    def __len__(self):
+        return len(self.tree)
+
+    def push(self, ev):
+        self.tree[ev] = ev
+
+    def pop(self):
+        ev = self.tree.find_min()
+        self.tree.remove(ev)
+        return ev
+
+    def updateTime(self, ev, newTime):
+        self.tree.remove(ev)
+        ev.time = newTime
+        self.tree[ev] = ev
+
+    def remove(self, ev):
+        self.tree.remove(ev)
+
+
+class heapEventQueue(object):
+
+    #   binary heap with lazy invalidation: every queued event keeps a
+    #   reference to its heap entry [time, eid, event], updating or deleting
+    #   an event only invalidates the old entry (event -> None), stale entries
+    #   are skipped by 'pop' and dropped once they outnumber the valid ones
+
+    minCompactSize = 1024
+
+    def __init__(self):
+        self.heap = []
+        self.nEvents = 0
+
+    def __len__(self):
+        return self.nEvents
+
+    def push(self, ev):
+        entry = [ev.time, ev.eid, ev]
+        ev.qEntry = entry
+        heapq.heappush(self.heap, entry)
+        self.nEvents += 1
+
+    def pop(self):
+        entry = heapq.heappop(self.heap)
+        while entry[2] is None:
+            entry = heapq.heappop(self.heap)
+        ev = entry[2]
+        ev.qEntry = None
+        self.nEvents -= 1
+        return ev
+
+    def updateTime(self, ev, newTime):
+        ev.qEntry[2] = None
+        ev.time = newTime
+        entry = [newTime, ev.eid, ev]
+        ev.qEntry = entry
+        heapq.heappush(self.heap, entry)
+        self.compact()
+
+    def remove(self, ev):
+        ev.qEntry[2] = None
+        ev.qEntry = None
+        self.nEvents -= 1
+        self.compact()
+
+    def compact(self):
+        if len(self.heap) > self.minCompactSize \
+                and len(self.heap) > 2 * self.nEvents:
+            self.heap = [entry for entry in self.heap if entry[2] is not None]
+            heapq.heapify(self.heap)
+        return
+
+
+class calendarEventQueue(object):
+
+    #   calendar queue (R. Brown, 1988): events are hashed into 'nBuckets'
+    #   buckets ('days') of 'width' seconds, every bucket is a heap of
+    #   entries [time, eid, event]; the number of buckets follows the number
+    #   of events and the bucket width is re-estimated from the separation
+    #   of the earliest events on every resize. As in 'heapEventQueue',
+    #   updated and deleted events only invalidate their entries, stale
+    #   entries are dropped at the head of a bucket or on a resize
+
+    minBuckets = 2
+    widthSampleSize = 25
+    minCompactSize = 1024
+
+    def __init__(self):
+        self.nEvents = 0
+        self.nStale = 0
+        self.lastTime = 0.0
+        self.buckets = []
+        self.localInit(self.minBuckets, 1.0, 0)
+
+    def __len__(self):
+        return self.nEvents
+
+    def localInit(self, nBuckets, width, curBucket):
+        self.nBuckets = nBuckets
+        self.width = width
+        self.buckets = [[] for _ in xrange(nBuckets)]
+        # 'virtual' bucket number: bucket index + nBuckets * year
+        self.curBucket = curBucket
+        return
+
+    def insert(self, entry):
+        vBucket = int(entry[0] / self.width)
+        heapq.heappush(self.buckets[vBucket % self.nBuckets], entry)
+        if vBucket < self.curBucket:
+            self.curBucket = vBucket
+        return
+
+    def head(self, bucket):
+        # the earliest valid entry of 'bucket' or None
+        while bucket and bucket[0][2] is None:
+            heapq.heappop(bucket)
+            self.nStale -= 1
+        return bucket[0] if bucket else None
+
+    def push(self, ev):
+        entry = [ev.time, ev.eid, ev]
+        ev.qEntry = entry
+        self.insert(entry)
+        self.nEvents += 1
+        if self.nEvents > 2 * self.nBuckets:
+            self.resize(2 * self.nBuckets)
+
+    def pop(self):
+        buckets = self.buckets
+        nBuckets = self.nBuckets
+        width = self.width
+        vBucket = self.curBucket
+        for i in xrange(nBuckets):
+            bucket = buckets[vBucket % nBuckets]
+            entry = self.head(bucket)
+            if entry is not None and int(entry[0] / width) <= vBucket:
+                break
+            vBucket += 1
+        else:
+            # nothing within a year, look for the earliest event directly
+            heads = [self.head(b) for b in buckets]
+            heads = [entry for entry in heads if entry is not None]
+            if not heads:
+                raise IndexError("pop from an empty event queue")
+            vBucket = int(min(heads)[0] / width)
+            bucket = buckets[vBucket % nBuckets]
+        entry = heapq.heappop(bucket)
+        self.curBucket = vBucket
+        self.lastTime = entry[0]
+        self.nEvents -= 1
+        if self.nEvents < self.nBuckets / 2 \
+                and self.nBuckets > self.minBuckets:
+            self.resize(self.nBuckets / 2)
+        ev = entry[2]
+        ev.qEntry = None
+        return ev
+
+    def updateTime(self, ev, newTime):
+        ev.qEntry[2] = None
+        self.nStale += 1
+        ev.time = newTime
+        entry = [newTime, ev.eid, ev]
+        ev.qEntry = entry
+        self.insert(entry)
+        self.compact()
+
+    def remove(self, ev):
+        ev.qEntry[2] = None
+        ev.qEntry = None
+        self.nStale += 1
+        self.nEvents -= 1
+        self.compact()
+
+    def compact(self):
+        if self.nStale > self.minCompactSize and self.nStale > self.nEvents:
+            self.resize(self.nBuckets)
+        return
+
+    def resize(self, nBuckets):
+        entries = [entry for bucket in self.buckets for entry in bucket
+                   if entry[2] is not None]
+        self.nStale = 0
+        width = self.width
+        sample = heapq.nsmallest(self.widthSampleSize, entries)
+        if len(sample) > 2:
+            avgSep = (sample[-1][0] - sample[0][0]) / (len(sample) - 1)
+            seps = [b[0] - a[0] for a, b in zip(sample, sample[1:])
+                    if b[0] - a[0] <= 2 * avgSep]
+            if seps and sum(seps) > 0:
+                width = 3.0 * sum(seps) / len(seps)
+        if sample:
+            curBucket = int(sample[0][0] / width)
+        else:
+            curBucket = int(self.lastTime / width)
+        self.localInit(nBuckets, width, curBucket)
+        for entry in entries:
+            self.insert(entry)
+        return
+
+
+class recordingEventQueue(object):
+
+    #   writes every queue operation to a file, one per line:
+    #   'p time eid' (push), 'o' (pop), 'u eid time' (update), 'r eid'
+    #   (remove); the recorded stream is replayed by eventQueueBench.py
+
+    def __init__(self, queue, fileName):
+        self.queue = queue
+        self.outFile = open(fileName, 'w')
+
+    def __len__(self):
+        return len(self.queue)
+
+    def push(self, ev):
+        self.outFile.write('p %r %d\n' % (ev.time, ev.eid))
+        self.queue.push(ev)
+
+    def pop(self):
+        self.outFile.write('o\n')
+        return self.queue.pop()
+
+    def updateTime(self, ev, newTime):
+        self.outFile.write('u %d %r\n' % (ev.eid, newTime))
+        self.queue.updateTime(ev, newTime)
+
+    def remove(self, ev):
+        self.outFile.write('r %d\n' % ev.eid)
+        self.queue.remove(ev)
+
+    def close(self):
+        self.outFile.close()
+
+
+queueTypes = {
+    'treap': treapEventQueue,
+    'heap': heapEventQueue,
+    'calendar': calendarEventQueue
+}
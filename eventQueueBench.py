@@ -0,0 +1,157 @@
+#!/usr/bin/env python2
+
+"""
+        CDNSim
+
+    file: eventQueueBench.py
+
+        NEC Europe Ltd. PROPRIETARY INFORMATION
+
+    This software is supplied under the terms of a license agreement
+    or nondisclosure agreement with NEC Europe Ltd. and may not be
+    copied or disclosed except in accordance with the terms of that
+    agreement. The software and its source code contain valuable trade
+    secrets and confidential information which have to be maintained in
+    confidence.
+    Any unauthorized publication, transfer to third parties or duplication
+    of the object or source code - either totally or in part - is
+    prohibited.
+
+        Copyright (c) 2016 NEC Europe Ltd. All Rights Reserved.
+
+    Author: Anton Ivanov <anton.ivanov@neclab.eu>
+
+    NEC Europe Ltd. DISCLAIMS ALL WARRANTIES, EITHER EXPRESS OR IMPLIED,
+    INCLUDING BUT NOT LIMITED TO IMPLIED WARRANTIES OF MERCHANTABILITY
+    AND FITNESS FOR A PARTICULAR PURPOSE AND THE WARRANTY AGAINST LATENT
+    DEFECTS, WITH RESPECT TO THE PROGRAM AND THE ACCOMPANYING
+    DOCUMENTATION.
+
+    No Liability For Consequential Damages IN NO EVENT SHALL NEC Europe
+    Ltd., NEC Corporation OR ANY OF ITS SUBSIDIARIES BE LIABLE FOR ANY
+    DAMAGES WHATSOEVER (INCLUDING, WITHOUT LIMITATION, DAMAGES FOR LOSS
+    OF BUSINESS PROFITS, BUSINESS INTERRUPTION, LOSS OF INFORMATION, OR
+    OTHER PECUNIARY LOSS AND INDIRECT, CONSEQUENTIAL, INCIDENTAL,
+    ECONOMIC OR PUNITIVE DAMAGES) ARISING OUT OF THE USE OF OR INABILITY
+    TO USE THIS PROGRAM, EVEN IF NEC Europe Ltd. HAS BEEN ADVISED OF THE
+    POSSIBILITY OF SUCH DAMAGES.
+
+        THIS HEADER MAY NOT BE EXTRACTED OR MODIFIED IN ANY WAY.
+"""
+
+from __future__ import print_function
+from decorations import printWithClock, printInfo
+import argparse
+import time
+import sys
+
+import sim_event as se
+import eventQueue as eq
+
+OP_PUSH = 0
+OP_POP = 1
+OP_UPDATE = 2
+OP_REMOVE = 3
+
+
+def readEventStream(fileName):
+    # recorded with 'cdnsim.py -recordEvents fileName'
+    ops = []
+    maxQueueSize = queueSize = 0
+    with open(fileName, 'r') as fIn:
+        for line in fIn:
+            fields = line.split()
+            if fields[0] == 'p':
+                ops.append((OP_PUSH, float(fields[1]), int(fields[2])))
+                queueSize += 1
+                if queueSize > maxQueueSize:
+                    maxQueueSize = queueSize
+            elif fields[0] == 'o':
+                ops.append((OP_POP, None, None))
+                queueSize -= 1
+            elif fields[0] == 'u':
+                ops.append((OP_UPDATE, float(fields[2]), int(fields[1])))
+            elif fields[0] == 'r':
+                ops.append((OP_REMOVE, None, int(fields[1])))
+                queueSize -= 1
+            else:
+                raise Exception(
+                    "Unrecognized format of event stream file,"
+                    " line:\n\t>> " + line
+                )
+    return ops, maxQueueSize
+
+
+def replayEventStream(queueType, ops):
+    queue = eq.queueTypes[queueType]()
+    events = dict()
+    popOrder = []
+    start = time.time()
+    for op, tim, eid in ops:
+        if op == OP_PUSH:
+            ev = se.event(tim, None, None, eid=eid)
+            events[eid] = ev
+            queue.push(ev)
+        elif op == OP_POP:
+            popOrder.append(queue.pop().eid)
+        elif op == OP_UPDATE:
+            queue.updateTime(events[eid], tim)
+        else:
+            queue.remove(events[eid])
+    return time.time() - start, popOrder
+
+
+def main(argv=None):
+
+    if argv is None:
+        argv = sys.argv[1:]
+    parser = argparse.ArgumentParser(
+        description='CDN-Sim event queue benchmark',
+        formatter_class=lambda prog: argparse.ArgumentDefaultsHelpFormatter(
+            prog, max_help_position=32
+        )
+    )
+    parser.add_argument('streams', metavar='file', nargs='+',
+                        help='Event streams recorded with -recordEvents')
+    parser.add_argument('-queues', metavar='list',
+                        default='treap,heap,calendar',
+                        help='Comma-separated list of event queues')
+    parser.add_argument('-repeat', metavar='number', type=int, default=3,
+                        help='Runs per queue (best is reported)')
+    args = parser.parse_args(argv)
+
+    queues = str(args.queues).replace(' ', '').split(',')
+    for q in queues:
+        if q not in eq.queueTypes:
+            print("unknown event queue: " + q)
+            return -1
+
+    result = 0
+    for fName in args.streams:
+        printWithClock("Reading event stream: " + fName)
+        ops, maxQueueSize = readEventStream(fName)
+        printInfo(str(len(ops)) + " operations, max. queue size " +
+                  str(maxQueueSize))
+        refTime = refOrder = None
+        for q in queues:
+            bestTime = None
+            for i in range(args.repeat):
+                dur, popOrder = replayEventStream(q, ops)
+                if bestTime is None or dur < bestTime:
+                    bestTime = dur
+            if refOrder is None:
+                refTime = bestTime
+                refOrder = popOrder
+            elif popOrder != refOrder:
+                printInfo(q + ": event order differs from " + queues[0])
+                result = -2
+            printInfo(
+                "{:>10}: {:8.3f}s, {:10.0f} ops/s, x{:.2f} vs. ".format(
+                    q, bestTime, len(ops) / bestTime, refTime / bestTime
+                ) + queues[0]
+            )
+    return result
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -42,10 +42,15 @@ from decorations import printWithClock
 import matplotlib.pyplot as plt
 import ipaddress as ip
 import networkx as nx
-import SubnetTree
+import numpy
+import binCache
+import chunkParser
+import prefixTable as pt
+from hostRanges import hostRanges
 import pickle
 import sys
 import os
+import math
 import re
 
 
@@ -61,44 +66,133 @@ class IPv4Network(ip.IPv4Network):
         return None
 
 
+#   layout version of the topology cache, bump on any change
+#   of the arrays stored by 'cache_write'
+TOPOLOGY_CACHE_VERSION = 3
+
+
+#   chunk parsers (see chunkParser), one regex search per chunk
+re_AS_link = re.compile('^(\d+)\t(\d+)\t(\d+)', re.M | re.UNICODE)
+re_origin = re.compile('^(\d+)\.(\d+)\.(\d+)\.(\d+)/(\d+)\t(\d+)',
+                       re.M | re.UNICODE)
+re_caida = re.compile(
+    '^"(\d+)"\t"(\d+)"\t"(.*)"\t"(.*)"\t"(.*)"\t"(.*)"\t"(.*)'
+    '"\t"(.*)"\t"(.*)"\t"(.*)"\t"(.*)"\t"(.*)"', re.M | re.UNICODE
+)
+re_geoAS = re.compile('^(\d+)\t(.+)\t(\d+-\d+-\d+)', re.M | re.UNICODE)
+
+
+def parseLinksChunk(text, irlLinkLife):
+    rows = numpy.array(re_AS_link.findall(text), dtype=numpy.int64)
+    rows = rows.reshape(-1, 3)
+    rows = rows[rows[:, 2] >= irlLinkLife]
+    return {'linkA': rows[:, 0], 'linkB': rows[:, 1]}
+
+
+def parseOriginChunk(text):
+    rows = numpy.array(re_origin.findall(text), dtype=numpy.int64)
+    rows = rows.reshape(-1, 6)
+    return {
+        'net': (rows[:, 0] << 24) | (rows[:, 1] << 16) |
+               (rows[:, 2] << 8) | rows[:, 3],
+        'prefixLen': rows[:, 4],
+        'asNum': rows[:, 5]
+    }
+
+
+def parseCAIDAChunk(text):
+    rows = re_caida.findall(text)
+    return {
+        'rankAS': numpy.array([r[1] for r in rows], dtype=numpy.int64),
+        'rankType': numpy.array([r[4] for r in rows], dtype=str),
+        'rankName': numpy.array([r[2] for r in rows], dtype=str),
+        'rankSize': numpy.array(
+            [int(r[7].replace(',', '')) if r[7] is not '' else -1
+             for r in rows], dtype=numpy.int64),
+        'rankDegree': numpy.array(
+            [int(r[11].replace(',', '')) if r[11] is not '' else -1
+             for r in rows], dtype=numpy.int64)
+    }
+
+
+def parseGeoASChunk(text):
+    return {'asNum': numpy.array([r[0] for r in re_geoAS.findall(text)],
+                                 dtype=numpy.int64)}
+
+
 class geoNetGraph:
-    def parseIRLorigin(self, fileName, ip2as=True, as2ip=False):
-        re_origin = re.compile('(\d+\.\d+\.\d+\.\d+/\d+)\t(\d+)', re.UNICODE)
-        if as2ip:
-            self.as2ip = dict()
-        if ip2as:
-            self.ip2as = SubnetTree.SubnetTree()
-        F_origin = open(fileName, 'r')
-        for line in iter(F_origin):
-            match = re_origin.match(line)
-            if match is not None:
-                asNum = int(match.group(2))
-                if ip2as:
-                    self.ip2as[match.group(1)] = asNum
-                if as2ip:
-                    newNet = IPv4Network(match.group(1))
-                    if newNet.prefixlen > self.smallSubnetPrefix:
-                        continue
-                    if asNum in self.netGraph:
-                        if asNum not in self.as2ip:
-                            self.as2ip[asNum] = [newNet]
-                        else:
-                            self.as2ip[asNum].append(newNet)
-        return None
+    def parseIRLlinks(self, fileName):
+        #   stage 'links': AS links that lived at least 'irlLinkLife' days,
+        #   in the file order, and every AS in the order of first appearance
+        columns = chunkParser.parseFile(
+            fileName,
+            parseLinksChunk,
+            (self.irlLinkLife,)
+        )
+        linkA = columns['linkA']
+        linkB = columns['linkB']
+        appearance = numpy.column_stack((linkA, linkB)).ravel()
+        nodes, first = numpy.unique(appearance, return_index=True)
+        return {
+            'linkA': linkA,
+            'linkB': linkB,
+            'nodeOrder': nodes[numpy.argsort(first)]
+        }
+
+    def parseIRLorigin(self, fileName):
+        #   stage 'origin': the ip2as longest-prefix-match table over all
+        #   prefixes and the (AS, network, prefix length) rows, in the file
+        #   order, of the prefixes not longer than 'smallSubnetPrefix'
+        columns = chunkParser.parseFile(fileName, parseOriginChunk)
+        ip2as = pt.prefixTable.build(zip(
+            columns['net'].tolist(),
+            columns['prefixLen'].tolist(),
+            columns['asNum'].tolist()
+        ))
+        small = columns['prefixLen'] <= self.smallSubnetPrefix
+        prefixLen = columns['prefixLen'][small]
+        hostBits = (numpy.int64(1) << (32 - prefixLen)) - 1
+        return {
+            'ip2asStarts': ip2as.starts,
+            'ip2asValues': ip2as.values,
+            'prefixAS': columns['asNum'][small],
+            'prefixNet': (columns['net'][small] & ~hostBits).astype(
+                numpy.uint32),
+            'prefixLen': prefixLen.astype(numpy.uint8)
+        }
+
+    def parseCAIDAranks(self, fileName):
+        #   stage 'rank': CAIDA rows in the file order, a missing
+        #   size or degree is stored as -1
+        return chunkParser.parseFile(fileName, parseCAIDAChunk)
+
+    def buildStage(self, name, fingerprint, parse, fileName):
+        #   the output of a build stage is cached in its own file, keyed by
+        #   the stage inputs, and shared by all country selections
+        stageFile = self.geo_as_dir + '/' + name + '.cache'
+        header = binCache.readHeader(stageFile)
+        if header is not None and header[0]['fingerprint'] == fingerprint:
+            printWithClock("Restoring the '" + name + "' stage from " +
+                           stageFile)
+            return binCache.read(stageFile)[1]
+        printWithClock("Building the '" + name + "' stage from " + fileName)
+        arrays = parse(fileName)
+        binCache.write(stageFile, {'fingerprint': fingerprint}, arrays)
+        return arrays
 
     def initContentProviders(self):
         asRouter = p2p_subnet = cp_Nodes = cp_NetDevs = cp_Interfaces = None
 
-        for subNet in self.as2ip[self.contentProvider]:
-            hostAS = self.ip2as[subNet[1].exploded]
+        for subNet, prefixLen in self.as2ip[self.contentProvider]:
+            hostAS = self.ip2as[subNet + 1]
             if hostAS == self.contentProvider:
-                p2p_subnet = subNet.subnets(new_prefix=30).next()
+                p2p_subnet = (subNet, 30)
                 printWithClock(
-                    "Content provider subnet: " + p2p_subnet.exploded)
+                    "Content provider subnet: " + pt.int2ip(subNet) + '/30')
                 break
         assert p2p_subnet is not None
 
-        host_ip = p2p_subnet[1]
+        host_ip = p2p_subnet[0] + 1
 
         self.netGraph.node[self.contentProvider]['as_router'] = asRouter
         self.netGraph.node[self.contentProvider]['ns_nets'] = [(
@@ -109,12 +203,12 @@ class geoNetGraph:
             }
         )]
         self.netGraph.node[self.contentProvider]['ip'] = host_ip
-        printWithClock("Content provider ip-address: " + host_ip.exploded)
+        printWithClock("Content provider ip-address: " + pt.int2ip(host_ip))
         return
 
     def populateGeoNetGraph(self, maxHosts, percentCache,
                             onlyPreselected=False):
-        listHosts = []
+        listHosts = hostRanges()
         listASesWithHosts = []
         if onlyPreselected:
             hostsAvailable = sum(
@@ -152,12 +246,16 @@ class geoNetGraph:
                         tmpAS['ns_nets'].append(subNetInfo)
                     else:
                         tmpAS['ns_nets'] = [subNetInfo]
-                    for h in net.hosts():
-                        if hostsPopulated < nHostsToPopulate:
-                            listHosts.append(h)
-                            hostsPopulated += 1
-                        else:
-                            break
+                    # hosts of a subnet: all but the network and
+                    # the broadcast addresses
+                    netAddress, prefixLen = net
+                    if hostsPopulated < nHostsToPopulate:
+                        nHosts = min(
+                            (1 << (32 - prefixLen)) - 2,
+                            int(math.ceil(nHostsToPopulate - hostsPopulated))
+                        )
+                        listHosts.append(netAddress + 1, nHosts)
+                        hostsPopulated += nHosts
                     if hostsPopulated >= nHostsToPopulate:
                         break
             if 'ns_nets' in tmpAS and len(tmpAS['ns_nets']) > 0:
@@ -169,27 +267,196 @@ class geoNetGraph:
         sg.random.shuffle(listASesWithHosts)
         for i in range(int(staticCaches)):
             self.netGraph.node[listASesWithHosts[i]]['static_cache'] = True
+            if self.asHasStaticCache is not None:
+                self.asHasStaticCache[
+                    self.asIndex[listASesWithHosts[i]]] = True
+        listHosts.freeze()
         return listHosts
 
+    def recordProviderDepth(self):
+        #   one BFS from the content provider: the hop count to the provider
+        #   is stored as the 'depth' of every AS in its connected component
+        depth = nx.single_source_shortest_path_length(
+            self.netGraph,
+            self.contentProvider
+        )
+        for n, d in depth.iteritems():
+            self.netGraph.node[n]['depth'] = d
+        return depth
+
+    def buildTopologyIndex(self):
+        #   integer-indexed copy of the final AS topology used by the
+        #   simulator: CSR adjacency (rows keep the networkx neighbour order),
+        #   typed per-AS attributes and one netLink slot per undirected edge
+        if self.netGraph.node[self.contentProvider].get('depth') != 0:
+            # legacy cache or a provider picked interactively
+            self.recordProviderDepth()
+        asNums = self.netGraph.nodes()
+        nAS = len(asNums)
+        self.asIndex = dict((asNum, i) for i, asNum in enumerate(asNums))
+        self.asNums = numpy.array(asNums, dtype=numpy.int64)
+        self.asIsAccess = numpy.array(
+            [self.isAccessNode(self.netGraph.node[n]['type'])
+             for n in asNums], dtype=bool
+        )
+        # filled by 'populateGeoNetGraph'
+        self.asHasStaticCache = numpy.array(
+            ['static_cache' in self.netGraph.node[n] for n in asNums],
+            dtype=bool
+        )
+        self.providerIP = self.netGraph.node[self.contentProvider]['ip']
+        self.asDepth = numpy.array(
+            [self.netGraph.node[n]['depth'] for n in asNums],
+            dtype=numpy.int32
+        )
+        indptr = [0]
+        indices = []
+        edgeIDs = []
+        edges = dict()
+        for i, asNum in enumerate(asNums):
+            for m in self.netGraph.adj[asNum]:
+                j = self.asIndex[m]
+                indices.append(j)
+                edgeIDs.append(edges.setdefault((min(i, j), max(i, j)),
+                                                len(edges)))
+            indptr.append(len(indices))
+        self.csrIndptr = numpy.array(indptr, dtype=numpy.int32)
+        self.csrIndices = numpy.array(indices, dtype=numpy.int32)
+        self.csrEdgeIDs = numpy.array(edgeIDs, dtype=numpy.int32)
+        # netLink objects are created on first use (see netRoutes.getLink)
+        self.edgeLinks = numpy.empty(len(edges), dtype=object)
+        return
+
+    def cache_fingerprint(self, irlLinks_f, irlOrigin_f, caida_f):
+        #   everything the cached topology depends on: the content of the
+        #   input files and the build parameters. A file is hashed again
+        #   only when its size or modification time changes
+        digests = binCache.digestStore(self.geo_as_dir + '/digests.json')
+        inputs = {
+            'links': digests.digest(irlLinks_f),
+            'origin': digests.digest(irlOrigin_f),
+            'rank': digests.digest(caida_f)
+        }
+        for countryPrefix in self.countries:
+            inputs['geoAS_' + countryPrefix] = digests.digest(
+                self.geo_as_dir + '/' + countryPrefix + '.dat'
+            )
+        if os.path.isdir(self.geo_as_dir):
+            digests.save()
+        return {
+            'version': TOPOLOGY_CACHE_VERSION,
+            'countries': sorted(self.countries),
+            'smallSubnetPrefix': self.smallSubnetPrefix,
+            'irlLinkLife': self.irlLinkLife,
+            'inputs': inputs
+        }
+
+    def stage_fingerprint(self, fingerprint, stage, *params):
+        return {
+            'version': fingerprint['version'],
+            'input': fingerprint['inputs'][stage],
+            'params': [getattr(self, p) for p in params]
+        }
 
-    def cache_write(self, cache_folder):
-        os.makedirs(cache_folder)
-        pickle.dump(self.contentProvider,
-                    open(cache_folder + '/contentProvider.cache', 'wb'),
-                    protocol=2)
-        pickle.dump(self.contentNodes,
-                    open(cache_folder + '/contentNodes.cache', 'wb'),
-                    protocol=2)
-        pickle.dump(self.accessNodes,
-                    open(cache_folder + '/accessNodes.cache', 'wb'),
-                    protocol=2)
-        nx.write_gpickle(self.netGraph, cache_folder + '/asGraph.cache')
-        pickle.dump(self.as2ip,
-                    open(cache_folder + '/as2ip.cache', 'wb'),
-                    protocol=2)
+    def cache_valid(self, cache_file, fingerprint):
+        header = binCache.readHeader(cache_file)
+        if header is None:
+            return False
+        meta = header[0]
+        return meta['fingerprint'] == fingerprint
+
+    def cache_write(self, cache_file, fingerprint):
+        nodes = self.netGraph.nodes()
+        edges = self.netGraph.edges()
+        prefixIndptr = [0]
+        prefixNet = []
+        prefixLen = []
+        for n in nodes:
+            for net, plen in self.as2ip[n]:
+                prefixNet.append(net)
+                prefixLen.append(plen)
+            prefixIndptr.append(len(prefixNet))
+        nodeAttr = [self.netGraph.node[n] for n in nodes]
+        arrays = {
+            'nodeAS': numpy.array(nodes, dtype=numpy.int64),
+            'nodeType': numpy.array([a['type'] for a in nodeAttr], dtype=str),
+            'nodeName': numpy.array([a['name'] for a in nodeAttr], dtype=str),
+            'nodeSize': numpy.array([a['size'] for a in nodeAttr],
+                                    dtype=numpy.int64),
+            # ASes missing in the CAIDA data have no degree: stored as -1
+            'nodeDegree': numpy.array(
+                [-1 if a['degree'] == '' else a['degree'] for a in nodeAttr],
+                dtype=numpy.int64
+            ),
+            'nodeCountry': numpy.array([a['country'] for a in nodeAttr],
+                                       dtype=str),
+            'nodeDepth': numpy.array([a['depth'] for a in nodeAttr],
+                                     dtype=numpy.int32),
+            'edgeA': numpy.array([e[0] for e in edges], dtype=numpy.int64),
+            'edgeB': numpy.array([e[1] for e in edges], dtype=numpy.int64),
+            'prefixIndptr': numpy.array(prefixIndptr, dtype=numpy.int64),
+            'prefixNet': numpy.array(prefixNet, dtype=numpy.uint32),
+            'prefixLen': numpy.array(prefixLen, dtype=numpy.uint8),
+            'ip2asStarts': self.ip2as.starts,
+            'ip2asValues': self.ip2as.values,
+            'contentNodes': numpy.array(self.contentNodes, dtype=numpy.int64),
+            'accessNodes': numpy.array(self.accessNodes, dtype=numpy.int64)
+        }
+        meta = {
+            'fingerprint': fingerprint,
+            'contentProvider': self.contentProvider
+        }
+        binCache.write(cache_file, meta, arrays)
+        return None
+
+    def cache_read(self, cache_file):
+        meta, arrays = binCache.read(cache_file)
+        self.contentProvider = meta['contentProvider']
+        self.contentNodes = arrays['contentNodes'].tolist()
+        self.accessNodes = arrays['accessNodes'].tolist()
+        self.ip2as = pt.prefixTable(
+            arrays['ip2asStarts'],
+            arrays['ip2asValues']
+        )
+        prefixIndptr = arrays['prefixIndptr'].tolist()
+        prefixNet = arrays['prefixNet'].tolist()
+        prefixLen = arrays['prefixLen'].tolist()
+        self.netGraph = nx.Graph()
+        self.as2ip = dict()
+        for i, (asNum, asType, name, size, degree, country, depth) in \
+                enumerate(zip(
+                    arrays['nodeAS'].tolist(),
+                    arrays['nodeType'].tolist(),
+                    arrays['nodeName'].tolist(),
+                    arrays['nodeSize'].tolist(),
+                    arrays['nodeDegree'].tolist(),
+                    arrays['nodeCountry'].tolist(),
+                    arrays['nodeDepth'].tolist()
+                )):
+            nets = zip(
+                prefixNet[prefixIndptr[i]:prefixIndptr[i + 1]],
+                prefixLen[prefixIndptr[i]:prefixIndptr[i + 1]]
+            )
+            self.as2ip[asNum] = nets
+            self.netGraph.add_node(
+                asNum,
+                type=asType,
+                name=name,
+                size=size,
+                subnetSizes=[1 << (32 - plen) for net, plen in nets],
+                degree='' if degree < 0 else degree,
+                country=country,
+                depth=depth
+            )
+        self.netGraph.add_edges_from(zip(
+            arrays['edgeA'].tolist(),
+            arrays['edgeB'].tolist()
+        ))
         return None
 
-    def cache_read(self, cache_folder):
+    def cache_read_legacy(self, cache_folder):
+        #   per-object pickles written by the previous versions, the input
+        #   files they were built from are unknown
         self.contentProvider = pickle.load(
             open(cache_folder + '/contentProvider.cache', 'rb')
         )
@@ -200,9 +467,14 @@ class geoNetGraph:
             open(cache_folder + '/accessNodes.cache', 'rb')
         )
         self.netGraph = nx.read_gpickle(cache_folder + '/asGraph.cache')
-        self.as2ip = pickle.load(
+        as2ip = pickle.load(
             open(cache_folder + '/as2ip.cache', 'rb')
         )
+        self.as2ip = dict(
+            (asNum, [(int(net.network_address), net.prefixlen)
+                     for net in nets])
+            for asNum, nets in as2ip.iteritems()
+        )
         return None
 
     def __init__(self, irlLinks_f, irlOrigin_f, caida_f, listOfCountries):
@@ -210,107 +482,153 @@ class geoNetGraph:
         self.overlayObjects = dict()
         self.contentProvider = None
         self.smallSubnetPrefix = 24
+        self.irlLinkLife = 31
         self.contentNodes = None
         self.accessNodes = None
         self.netGraph = None
         self.geo_as_dir = "geoAS"
         self.cache_folder = self.geo_as_dir + '/' + '_'.join(sorted(listOfCountries))
+        self.cache_file = self.cache_folder + '.cache'
         self.pickedNodes = []
         self.as2ip = None
         self.ip2as = None
         self.hosts = None
         self.pos = None
+        self.routes = None
+        self.asIndex = None
+        self.asNums = None
+        self.asIsAccess = None
+        self.asHasStaticCache = None
+        self.providerIP = None
+        self.asDepth = None
+        self.csrIndptr = None
+        self.csrIndices = None
+        self.csrEdgeIDs = None
+        self.edgeLinks = None
 
-        re_AS_link = re.compile('(\d+)\t(\d+)\t(\d+)', re.UNICODE)
-        re_caida = re.compile(
-            '"(\d+)"\t"(\d+)"\t"(.*)"\t"(.*)"\t"(.*)"\t"(.*)"\t"(.*)'
-            '"\t"(.*)"\t"(.*)"\t"(.*)"\t"(.*)"\t"(.*)"', re.UNICODE
-        )
-        re_geoAS = re.compile('(\d+)\t(.+)\t(\d+-\d+-\d+)\.*', re.UNICODE)
 
 
-        if os.path.exists(self.cache_folder):
+        fingerprint = self.cache_fingerprint(irlLinks_f, irlOrigin_f, caida_f)
+        canBuild = os.path.isfile(irlLinks_f) and os.path.isfile(caida_f)
+        if self.cache_valid(self.cache_file, fingerprint):
             printWithClock("geoNetGraph cache for " + str(listOfCountries) +
-                           " found in " + self.cache_folder +
+                           " found in " + self.cache_file +
                            ", restoring geoNetGraph")
-            self.cache_read(self.cache_folder)
+            self.cache_read(self.cache_file)
+            printWithClock("Restore complete.")
+        elif not canBuild and os.path.exists(self.cache_folder):
+            # the topology input files are not available:
+            # fall back to the legacy cache (it cannot be validated)
+            printWithClock("geoNetGraph legacy cache for " +
+                           str(listOfCountries) + " found in " +
+                           self.cache_folder + ", restoring geoNetGraph")
+            self.cache_read_legacy(self.cache_folder)
             printWithClock("Restore complete. Reading IRL origin, "
                            "building the 2nd part of the AS_num <-> "
                            "IP_subnet map..")
-            self.parseIRLorigin(irlOrigin_f)
+            origin = self.buildStage(
+                'origin',
+                self.stage_fingerprint(fingerprint, 'origin',
+                                       'smallSubnetPrefix'),
+                self.parseIRLorigin,
+                irlOrigin_f
+            )
+            self.ip2as = pt.prefixTable(
+                origin['ip2asStarts'],
+                origin['ip2asValues']
+            )
         else:
-            printWithClock("geoNetGraph cache for " + str(listOfCountries) +
-                           " not found, building geoNetGraph..")
+            if os.path.exists(self.cache_file):
+                printWithClock("geoNetGraph cache in " + self.cache_file +
+                               " does not match the input files or "
+                               "parameters, rebuilding geoNetGraph..")
+            else:
+                printWithClock("geoNetGraph cache for " +
+                               str(listOfCountries) +
+                               " not found, building geoNetGraph..")
             print("\t>>> This will take a while, "
                   "you may go take a cup of coffee.. <<<")
             printWithClock("Reading IRL topology graph..")
-            self.netGraph = nx.Graph()
-            irlLinkLife = 31
-            F_AS_links = open(irlLinks_f, 'r')
-            for line in iter(F_AS_links):
-                match = re_AS_link.match(line)
-                if match is not None:
-                    if int(match.group(3)) >= irlLinkLife:
-                        self.netGraph.add_node(
-                            int(match.group(1)),
-                            type='',
-                            name='',
-                            size=0,
-                            subnetSizes=[],
-                            degree='',
-                            country=''
-                        )
-                        if int(match.group(2)) not in self.netGraph:
-                            self.netGraph.add_node(
-                                int(match.group(2)),
-                                type='',
-                                name='',
-                                size=0,
-                                subnetSizes=[],
-                                degree='',
-                                country=''
-                            )
-                        self.netGraph.add_edge(
-                            int(match.group(1)),
-                            int(match.group(2))
-                        )
-            F_AS_links.close()
+            links = self.buildStage(
+                'links',
+                self.stage_fingerprint(fingerprint, 'links', 'irlLinkLife'),
+                self.parseIRLlinks,
+                irlLinks_f
+            )
+            origin = self.buildStage(
+                'origin',
+                self.stage_fingerprint(fingerprint, 'origin',
+                                       'smallSubnetPrefix'),
+                self.parseIRLorigin,
+                irlOrigin_f
+            )
+            ranks = self.buildStage(
+                'rank',
+                self.stage_fingerprint(fingerprint, 'rank'),
+                self.parseCAIDAranks,
+                caida_f
+            )
             printWithClock("Total ASes in the topology: " +
-                           str(self.netGraph.number_of_nodes()) +
-                           ", Edges:" + str(self.netGraph.number_of_edges()))
+                           str(len(links['nodeOrder'])) +
+                           ", Links:" + str(len(links['linkA'])))
 
             printWithClock("Reading geoAS data..", end=" ")
+            allASes = set(links['nodeOrder'].tolist())
             geoASes = dict()
-            geoASes_flat = []
             for countryPrefix in self.countries:
-                F_country = open(self.geo_as_dir+'/'+countryPrefix+'.dat', 'r')
                 print(countryPrefix, end=" ")
-                for line in iter(F_country):
-                    match = re_geoAS.match(line)
-                    if match is not None:
-                        asNum = int(match.group(1))
-                        if asNum in self.netGraph:
-                            self.netGraph.node[asNum]['country'] = countryPrefix
-                            geoASes_flat.append(asNum)
-                            if countryPrefix not in geoASes:
-                                geoASes[countryPrefix] = [asNum]
-                            else:
-                                geoASes[countryPrefix].append(asNum)
-                F_country.close()
-            print("\n\t" + str(sum(len(li) for li in geoASes.values())) +
+                for asNum in chunkParser.parseFile(
+                        self.geo_as_dir + '/' + countryPrefix + '.dat',
+                        parseGeoASChunk
+                )['asNum'].tolist():
+                    if asNum in allASes:
+                        # an AS listed for several countries
+                        # keeps the last one
+                        geoASes[asNum] = countryPrefix
+            print("\n\t" + str(len(geoASes)) +
                   " ASes satisfied " + str(self.countries))
 
             printWithClock("Applying the geoAS data..")
             printWithClock("Removing", end=" ")
-            toDel = [n for n in self.netGraph.nodes_iter()
-                     if n not in geoASes_flat]
-            print(str(len(toDel)) +
+            print(str(len(allASes) - len(geoASes)) +
                   " ASes located outside of the provided region")
-            self.netGraph.remove_nodes_from(toDel)
+            self.netGraph = nx.Graph()
+            for asNum in links['nodeOrder'].tolist():
+                if asNum in geoASes:
+                    self.netGraph.add_node(
+                        asNum,
+                        type='',
+                        name='',
+                        size=0,
+                        subnetSizes=[],
+                        degree='',
+                        country=geoASes[asNum]
+                    )
+            regionASes = numpy.array(geoASes.keys(), dtype=numpy.int64)
+            inRegion = numpy.in1d(links['linkA'], regionASes) & \
+                numpy.in1d(links['linkB'], regionASes)
+            self.netGraph.add_edges_from(zip(
+                links['linkA'][inRegion].tolist(),
+                links['linkB'][inRegion].tolist()
+            ))
 
             printWithClock("Reading IRL origin, "
                            "building the AS_num<->IP_subnet map..")
-            self.parseIRLorigin(irlOrigin_f, ip2as=True, as2ip=True)
+            self.ip2as = pt.prefixTable(
+                origin['ip2asStarts'],
+                origin['ip2asValues']
+            )
+            self.as2ip = dict()
+            inRegion = numpy.in1d(origin['prefixAS'], regionASes)
+            for asNum, net, plen in zip(
+                    origin['prefixAS'][inRegion].tolist(),
+                    origin['prefixNet'][inRegion].tolist(),
+                    origin['prefixLen'][inRegion].tolist()
+            ):
+                if asNum not in self.as2ip:
+                    self.as2ip[asNum] = [(net, plen)]
+                else:
+                    self.as2ip[asNum].append((net, plen))
 
             printWithClock("Removing", end=" ")
             toDel = [n for n in self.netGraph.nodes_iter()
@@ -321,26 +639,25 @@ class geoNetGraph:
             printWithClock("Reading the CAIDA AS data..")
             self.accessNodes = []
             self.contentNodes = []
-            F_CAIDA_RANKS = open(caida_f, 'r')
-            for line in iter(F_CAIDA_RANKS):
-                match = re_caida.match(line)
-                if match is not None:
-                    asNum = int(match.group(2))
-                    if asNum in self.netGraph:
-                        node = self.netGraph.node[asNum]
-                        node['type'] = match.group(5)
-                        node['name'] = match.group(3)
-                        if match.group(8) is not '':
-                            node['size'] = int(match.group(8).replace(',', ''))
-                        if match.group(12) is not '':
-                            node['degree'] = int(
-                                match.group(12).replace(',', '')
-                            )
-                        if self.isAccessNode(match.group(5)):
-                            self.accessNodes.append(asNum)
-                        if self.isContentNode(match.group(5)):
-                            self.contentNodes.append(asNum)
-            F_CAIDA_RANKS.close()
+            inRegion = numpy.in1d(ranks['rankAS'], self.netGraph.nodes())
+            for asNum, asType, name, size, degree in zip(
+                    ranks['rankAS'][inRegion].tolist(),
+                    ranks['rankType'][inRegion].tolist(),
+                    ranks['rankName'][inRegion].tolist(),
+                    ranks['rankSize'][inRegion].tolist(),
+                    ranks['rankDegree'][inRegion].tolist()
+            ):
+                node = self.netGraph.node[asNum]
+                node['type'] = asType
+                node['name'] = name
+                if size >= 0:
+                    node['size'] = size
+                if degree >= 0:
+                    node['degree'] = degree
+                if self.isAccessNode(asType):
+                    self.accessNodes.append(asNum)
+                if self.isContentNode(asType):
+                    self.contentNodes.append(asNum)
 
             printWithClock("Selecting a content provider within "
                            "the region of interest:", end=" ")
@@ -354,8 +671,8 @@ class geoNetGraph:
                   str(self.netGraph.node[self.contentProvider]['degree']))
 
             printWithClock("Removing", end=" ")
-            toDel = [n for n in self.netGraph.nodes_iter()
-                     if not nx.has_path(self.netGraph, self.contentProvider, n)]
+            depth = self.recordProviderDepth()
+            toDel = [n for n in self.netGraph.nodes_iter() if n not in depth]
             print(str(len(toDel)) +
                   " ASes with no connection to the content provider..")
             self.netGraph.remove_nodes_from(toDel)
@@ -370,8 +687,8 @@ class geoNetGraph:
             self.allocHostAddresses()
 
             printWithClock("Saving geoNetGraph cache for " +
-                           str(listOfCountries) + " in " + self.cache_folder)
-            self.cache_write(self.cache_folder)
+                           str(listOfCountries) + " in " + self.cache_file)
+            self.cache_write(self.cache_file, fingerprint)
 
         printWithClock("Final number of ASes in the sub-graph: " +
                        str(self.netGraph.number_of_nodes()) + ", Edges:" +
@@ -384,19 +701,26 @@ class geoNetGraph:
         return
 
     def allocHostAddresses(self):
-        for curASn, curAS in self.netGraph.nodes_iter(data=True):
-            curASnets = self.as2ip[curASn]
+        #   keep only the prefixes where the first host of every
+        #   'smallSubnetPrefix' block maps back to the AS, i.e., no
+        #   more-specific prefix of another AS covers it
+        nodes = self.netGraph.nodes()
+        netOwners = [n for n in nodes for net in self.as2ip[n]]
+        netStarts = [net for n in nodes for net, plen in self.as2ip[n]]
+        netEnds = [net + (1 << (32 - plen))
+                   for n in nodes for net, plen in self.as2ip[n]]
+        keep = iter(self.ip2as.probesOwned(
+            netStarts,
+            netEnds,
+            numpy.array(netOwners, dtype=numpy.int64),
+            1 << (32 - self.smallSubnetPrefix)
+        ).tolist())
+        for curASn in nodes:
+            curAS = self.netGraph.node[curASn]
             updatedASnets = []
-            for curASnet in curASnets:
-                skipThisNet = False
-                for smallSubnet in curASnet.subnets(
-                        new_prefix=self.smallSubnetPrefix
-                ):
-                    if self.ip2as[smallSubnet[1].exploded] != curASn:
-                        skipThisNet = True
-                        break
-                if not skipThisNet:
-                    curAS['subnetSizes'].append(curASnet.num_addresses)
+            for curASnet in self.as2ip[curASn]:
+                if next(keep):
+                    curAS['subnetSizes'].append(1 << (32 - curASnet[1]))
                     updatedASnets.append(curASnet)
             self.as2ip[curASn] = updatedASnets
         return
@@ -858,6 +1182,8 @@ class geoNetGraph:
         fig.canvas.mpl_disconnect(cid)
         self.overlayObjects = dict()
         if len(self.pickedNodes) > 0:
+            if not os.path.exists(self.cache_folder):
+                os.makedirs(self.cache_folder)
             pickle.dump(
                 self.pickedNodes,
                 open(self.cache_folder + '/userPickedSetup.cache', 'wb'),
@@ -46,6 +46,8 @@ import Queue
 import treap
 
 import sim_globals as sg
+import eventQueue as eq
+import netLink as nl
 
 
 def eventQueueKeeper(inPipe, outQueue, commLock):
@@ -164,6 +166,12 @@ class highLevelSimulation:
         self.cacheStatistics_hw = []
         self.urStatistics_nActCons = []
         self.urStatistics_nReqPSec = []
+        self.reallocator = None
+        if sg.args.reallocation == 'event':
+            self.reallocator = nl.bandwidthReallocator()
+        self.rateCascade = None
+        if sg.args.hierarchical:
+            self.rateCascade = nl.rateCascade()
         if sg.args.parallel:
             printInfo("DISCLAIMER: Parallel simulation is a test feature!")
             #   calcFairThroughput
@@ -183,7 +191,12 @@ class highLevelSimulation:
             self.eventUpdateTime = self.eventUpdateTime_parallel
             self.deleteEvent = self.deleteEvent_parallel
         else:
-            self.eventQueue = treap.treap()
+            self.eventQueue = eq.queueTypes[sg.args.eventQueue]()
+            if sg.args.recordEvents != '':
+                printInfo("Recording event queue operations to: " +
+                          sg.args.recordEvents)
+                self.eventQueue = eq.recordingEventQueue(
+                    self.eventQueue, sg.args.recordEvents)
             self.step = self.step_sequential
             self.eventPush = self.eventPush_sequential
             self.eventUpdateTime = self.eventUpdateTime_sequential
@@ -198,11 +211,12 @@ class highLevelSimulation:
             self.eventQueueProcess.join()
 
     def step_sequential(self):
-        e = self.eventQueue.find_min()
-        self.eventQueue.remove(e)
+        e = self.eventQueue.pop()
         self.lastEventTime = e.time
         objRef = sg.event_obj_dict[e.objRef_id]
         objRef.process(e)
+        if self.rateCascade is not None:
+            self.rateCascade.flush(e.time)
         return self.eventQueue
 
     def step_parallel(self):
@@ -220,10 +234,12 @@ class highLevelSimulation:
         self.lastEventTime = e.time
         objRef = sg.event_obj_dict[e.objRef_id]
         objRef.process(e)
+        if self.rateCascade is not None:
+            self.rateCascade.flush(e.time)
         return True
 
     def eventPush_sequential(self, ev):
-        self.eventQueue[ev] = ev
+        self.eventQueue.push(ev)
 
     def eventPush_parallel(self, e):
         self.communicationLock.acquire()
@@ -233,9 +249,7 @@ class highLevelSimulation:
     def eventUpdateTime_sequential(self, e, newTime):
         #   try to speedup: limit to microsecond precision
         if e.time - newTime > 0.000001:
-            self.eventQueue.remove(e)
-            e.time = newTime
-            self.eventQueue[e] = e
+            self.eventQueue.updateTime(e, newTime)
         return
 
     def eventUpdateTime_parallel(self, e, newTime):
@@ -0,0 +1,87 @@
+"""
+    CDNSim
+
+file: hostRanges.py
+
+    NEC Europe Ltd. PROPRIETARY INFORMATION
+
+This software is supplied under the terms of a license agreement
+or nondisclosure agreement with NEC Europe Ltd. and may not be
+copied or disclosed except in accordance with the terms of that
+agreement. The software and its source code contain valuable trade
+secrets and confidential information which have to be maintained in
+confidence.
+Any unauthorized publication, transfer to third parties or duplication
+of the object or source code - either totally or in part - is
+prohibited.
+
+    Copyright (c) 2016 NEC Europe Ltd. All Rights Reserved.
+
+Author: Anton Ivanov <anton.ivanov@neclab.eu>
+
+NEC Europe Ltd. DISCLAIMS ALL WARRANTIES, EITHER EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO IMPLIED WARRANTIES OF MERCHANTABILITY
+AND FITNESS FOR A PARTICULAR PURPOSE AND THE WARRANTY AGAINST LATENT
+DEFECTS, WITH RESPECT TO THE PROGRAM AND THE ACCOMPANYING
+DOCUMENTATION.
+
+No Liability For Consequential Damages IN NO EVENT SHALL NEC Europe
+Ltd., NEC Corporation OR ANY OF ITS SUBSIDIARIES BE LIABLE FOR ANY
+DAMAGES WHATSOEVER (INCLUDING, WITHOUT LIMITATION, DAMAGES FOR LOSS
+OF BUSINESS PROFITS, BUSINESS INTERRUPTION, LOSS OF INFORMATION, OR
+OTHER PECUNIARY LOSS AND INDIRECT, CONSEQUENTIAL, INCIDENTAL,
+ECONOMIC OR PUNITIVE DAMAGES) ARISING OUT OF THE USE OF OR INABILITY
+TO USE THIS PROGRAM, EVEN IF NEC Europe Ltd. HAS BEEN ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGES.
+
+    THIS HEADER MAY NOT BE EXTRACTED OR MODIFIED IN ANY WAY.
+"""
+
+
+import numpy
+
+
+class hostRanges:
+
+    #   populated host addresses as (first address, count) ranges of
+    #   integer addresses instead of a flat list of hosts. 'sample' draws
+    #   exactly like 'rnd.choice()' over the flat list in the same order
+
+    def __init__(self):
+        self.starts = []
+        self.counts = []
+        self.ends = None
+        self.total = 0
+        return
+
+    def append(self, start, count):
+        if count > 0:
+            self.starts.append(start)
+            self.counts.append(count)
+            self.total += count
+        return
+
+    def freeze(self):
+        self.starts = numpy.array(self.starts, dtype=numpy.int64)
+        self.counts = numpy.array(self.counts, dtype=numpy.int64)
+        # index (in the flat host list) past the last host of every range
+        self.ends = numpy.cumsum(self.counts)
+        return
+
+    def __len__(self):
+        return self.total
+
+    def __getitem__(self, k):
+        if not 0 <= k < self.total:
+            raise IndexError(k)
+        i = self.ends.searchsorted(k, 'right')
+        return int(self.starts[i] + k - self.ends[i] + self.counts[i])
+
+    def sample(self, rnd):
+        return self[int(rnd.random() * self.total)]
+
+    def sampleArray(self, size):
+        # 'size' hosts drawn with numpy.random
+        k = (numpy.random.random_sample(size) * self.total).astype(numpy.int64)
+        i = self.ends.searchsorted(k, 'right')
+        return self.starts[i] + k - self.ends[i] + self.counts[i]
@@ -46,6 +46,7 @@ import math
 import sim_globals as sg
 import sim_event as se
 import netLink as nl
+import prefixTable as pt
 
 
 class netDataStream:
@@ -63,6 +64,7 @@ class netDataStream:
         self.sizeBit = s
         self.transmitPoint = None
         self.consumeRate = float(cr)
+        self.rateID = sg.STREAM_RATE_IDS.get(cr)
         self.srcIP = sip
         self.dstIP = dip
         self.links = []
@@ -78,6 +80,16 @@ class netDataStream:
         self.eventRef_bufferEmpty = None
         self.eventRef_expand = None
         self.eventRef_toLiveTRate = None
+        # '-streamTimers single': the pending eventRef_* timers by eid and
+        # the earliest of them, only timers that have been the earliest one
+        # are in the event queue (by eid)
+        self.timers = None
+        self.firstTimer = None
+        self.queuedTimers = None
+        if sg.args.streamTimers == 'single':
+            self.timers = dict()
+            self.queuedTimers = set()
+        self.timerFiring = False
         self.stats_startTime = None
         self.stats_bufferingTime = 0.0
         self.stats_bufferingEvents = 0
@@ -110,16 +122,22 @@ class netDataStream:
             s = 'netNoiseStream-'
         else:
             s = 'unknownStream-'
-        s += str(self.id) + ' from: ' + self.srcIP +\
+        s += str(self.id) + ' from: ' + self.formatIP(self.srcIP) +\
             (
                 '(c' + str(len(self.links)) + ')'
                 if self.connectedToCache
                 else '(d' + str(len(self.links)) + ')'
             ) +\
-            ', to: ' + self.dstIP + ', transmitRate: ' +\
+            ', to: ' + self.formatIP(self.dstIP) + ', transmitRate: ' +\
             str(self.transmitRate) + 'b/s'
         return s
 
+    def formatIP(self, address):
+        # addresses are integers, cache streams have no destination address
+        if address is None:
+            return 'cache@' + str(self.downCacheRef.ASnum)
+        return pt.int2ip(address)
+
     def __getstate__(self):
         return self.bottleneckLink.id, self.transmitRate
 
@@ -141,13 +159,14 @@ class netDataStream:
                  self.getAvgTRate(),
                  self.consumeRate,
                  self.connectedToCache,
-                 self.srcIP,
-                 self.dstIP)
+                 pt.int2ip(self.srcIP),
+                 pt.int2ip(self.dstIP))
             )
         if self.streamType != sg.STREAM_NORMAL:
             return
         s = 'stream-' + str(self.id) +\
-            ' from: ' + self.srcIP + ', to: ' + self.dstIP + '\n' +\
+            ' from: ' + pt.int2ip(self.srcIP) +\
+            ', to: ' + pt.int2ip(self.dstIP) + '\n' +\
             'start time: {:.2f}'.format(self.stats_startTime) +\
             ', buffering time: {:.2f}'.format(self.stats_bufferingTime) +\
             ', buffering events:' + str(self.stats_bufferingEvents) +\
@@ -285,15 +304,15 @@ class netDataStream:
                     sg.EVENT_STREAM_COMPLETED,
                     self
                 )
-                sg.simRef.eventPush(self.eventRef_trComplete)
+                self.timerPush(self.eventRef_trComplete)
             else:
-                sg.simRef.eventUpdateTime(
+                self.timerUpdate(
                     self.eventRef_trComplete,
                     expStreamingComplete
                 )
         else:
             if self.eventRef_trComplete is not None:
-                sg.simRef.deleteEvent(self.eventRef_trComplete)
+                self.timerDelete(self.eventRef_trComplete)
                 self.eventRef_trComplete = None
         return
 
@@ -315,16 +334,16 @@ class netDataStream:
                     sg.EVENT_CONSUME_BUFFER_EMPTY,
                     self
                 )
-                sg.simRef.eventPush(self.eventRef_bufferEmpty)
+                self.timerPush(self.eventRef_bufferEmpty)
             else:
-                sg.simRef.eventUpdateTime(
+                self.timerUpdate(
                     self.eventRef_bufferEmpty,
                     curTime +
                     timeLeft
                 )
         elif self.eventRef_bufferEmpty is not None:
                 # buffer will not become empty
-                sg.simRef.deleteEvent(self.eventRef_bufferEmpty)
+                self.timerDelete(self.eventRef_bufferEmpty)
                 self.eventRef_bufferEmpty = None
         return
 
@@ -358,9 +377,9 @@ class netDataStream:
                     sg.EVENT_SWITCH_TO_LIVERATE,
                     self
                 )
-                sg.simRef.eventPush(self.eventRef_toLiveTRate)
+                self.timerPush(self.eventRef_toLiveTRate)
             else:
-                sg.simRef.eventUpdateTime(
+                self.timerUpdate(
                     self.eventRef_toLiveTRate,
                     timeTillSwitch
                 )
@@ -389,18 +408,18 @@ class netDataStream:
                     sg.EVENT_CONSUME_BEGIN,
                     self
                 )
-                sg.simRef.eventPush(self.eventRef_consBegin)
+                self.timerPush(self.eventRef_consBegin)
             else:  # update old
-                sg.simRef.eventUpdateTime(
+                self.timerUpdate(
                     self.eventRef_consBegin,
                     readyToPlayTime
                 )
         elif bufferSize == inBuffer and inBuffer > 0:
             if self.eventRef_consBegin is not None:
-                sg.simRef.eventUpdateTime(self.eventRef_consBegin, curTime)
+                self.timerUpdate(self.eventRef_consBegin, curTime)
         else:
             if self.eventRef_consBegin is not None:
-                sg.simRef.deleteEvent(self.eventRef_consBegin)
+                self.timerDelete(self.eventRef_consBegin)
                 self.eventRef_consBegin = None
         return
 
@@ -417,18 +436,76 @@ class netDataStream:
                     sg.EVENT_CONSUME_COMPLETE,
                     self
                 )
-                sg.simRef.eventPush(self.eventRef_consComplete)
+                self.timerPush(self.eventRef_consComplete)
             else:
-                sg.simRef.eventUpdateTime(
+                self.timerUpdate(
                     self.eventRef_consComplete,
                     curTime + duration
                 )
         else:
             if self.eventRef_consComplete is not None:
-                sg.simRef.deleteEvent(self.eventRef_consComplete)
+                self.timerDelete(self.eventRef_consComplete)
                 self.eventRef_consComplete = None
         return
 
+    def timerPush(self, ev):
+        if self.timers is None:
+            sg.simRef.eventPush(ev)
+        else:
+            self.timers[ev.eid] = ev
+            if self.firstTimer is None or ev < self.firstTimer:
+                self.firstTimer = ev
+            self.scheduleTimer()
+        return
+
+    def timerUpdate(self, ev, newTime):
+        # timers only move earlier
+        if self.timers is None:
+            sg.simRef.eventUpdateTime(ev, newTime)
+            return
+        if ev.eid in self.queuedTimers:
+            sg.simRef.eventUpdateTime(ev, newTime)
+        elif ev.time - newTime > 0.000001:
+            # same precision limit as for queued events
+            ev.time = newTime
+        else:
+            return
+        if ev < self.firstTimer:
+            self.firstTimer = ev
+        self.scheduleTimer()
+        return
+
+    def timerRemoved(self, ev):
+        del self.timers[ev.eid]
+        if ev is self.firstTimer:
+            self.firstTimer = min(self.timers.itervalues()) \
+                if self.timers else None
+        return
+
+    def timerDelete(self, ev):
+        if self.timers is None:
+            sg.simRef.deleteEvent(ev)
+            return
+        self.timerRemoved(ev)
+        if ev.eid in self.queuedTimers:
+            self.queuedTimers.remove(ev.eid)
+            sg.simRef.deleteEvent(ev)
+            self.scheduleTimer()
+        return
+
+    def scheduleTimer(self):
+        # the earliest timer must be in the event queue, the others are
+        # queued once they become the earliest and stay queued until they
+        # fire or are deleted. While a timer is processed this is done
+        # afterwards
+        first = self.firstTimer
+        if self.timerFiring or first is None:
+            return
+        if first.eid not in self.queuedTimers:
+            self.queuedTimers.add(first.eid)
+            sg.simRef.eventPush(first)
+        return
+
     def updateEvents(self, curTime):
         self.updateEvent_trComplete(curTime)
         if sg.args.streaming:
@@ -438,7 +515,7 @@ class netDataStream:
             self.updateEvent_consumeBegin(curTime)
         if not self.beingTransmitted:
             if self.eventRef_expand is not None:
-                sg.simRef.deleteEvent(self.eventRef_expand)
+                self.timerDelete(self.eventRef_expand)
                 self.eventRef_expand = None
         return
 
@@ -477,20 +554,23 @@ class netDataStream:
             self.setTransmitRate(newTR, curTime)
             for link in self.links:
                 link.allocateBandwidthForNewStream(curTime, newTR)
-                link.netDataStreams.append(self)
+                link.attachStream(self)
         else:
             # implementing simultaneous start of background noise streams
             # they are all placed onto the links, but have tRate = 0
             newTR = self.bottleneckLink.getFairThroughput(0)
             self.stats_lastTransmitRate_time = curTime
             self.setTransmitRate(newTR, curTime)
-        self.eventRef_expand = se.event(
-            curTime + sg.EXPAND_INTERVAL,
-            id(self),
-            sg.EVENT_STREAM_EXPAND,
-            self
-        )
-        sg.simRef.eventPush(self.eventRef_expand)
+        if sg.simRef.reallocator is not None:
+            sg.simRef.reallocator.markDirty(self.links, curTime)
+        else:
+            self.eventRef_expand = se.event(
+                curTime + sg.EXPAND_INTERVAL,
+                id(self),
+                sg.EVENT_STREAM_EXPAND,
+                self
+            )
+            self.timerPush(self.eventRef_expand)
         return
 
     def setTransmitRate(self, newRate, curTime):
@@ -506,21 +586,32 @@ class netDataStream:
                 (curTime - self.stats_lastTransmitRate_time)
             self.stats_lastTransmitRate_time = curTime
             self.transmitRate = newRate
+            for link in self.links:
+                link.updateStreamRate(self)
             self.updateEvents(curTime)
+            if newRate < old_rate and self.beingTransmitted \
+                    and sg.simRef.reallocator is not None:
+                # the bandwidth released on the other links can be reused
+                sg.simRef.reallocator.markDirty(self.links, curTime)
             if self.streamType == sg.STREAM_CACHE:
-                self.downCacheRef.updateDependentStreams(self, curTime)
+                if sg.simRef.rateCascade is not None:
+                    sg.simRef.rateCascade.add(self)
+                else:
+                    self.downCacheRef.updateDependentStreams(self, curTime)
             if self.connectedToCache and self.upCacheRef is not None:
                 self.upCacheRef.updateThroughputStats(old_rate, newRate)
         return
 
-    def tryUseMaxTRate(self, curTime):
+    def tryUseMaxTRate(self, curTime, cacheStreamTRate=None):
+        #   'cacheStreamTRate': rate of the parent cache stream, if known
         tr = self.updateBottleneckLink()
         if self.transmitingLive:
-            if self.connectedToCache and self.upCacheRef is not None:
-                cacheStreamTRate = \
-                    self.upCacheRef.getParentCacheStreamTransmitRate(self)
-            else:
-                cacheStreamTRate = self.consumeRate
+            if cacheStreamTRate is None:
+                if self.connectedToCache and self.upCacheRef is not None:
+                    cacheStreamTRate = \
+                        self.upCacheRef.getParentCacheStreamTransmitRate(self)
+                else:
+                    cacheStreamTRate = self.consumeRate
             if cacheStreamTRate < tr:
                 tr = cacheStreamTRate
         if self.transmitRate != tr:
@@ -529,7 +620,7 @@ class netDataStream:
 
     def updateBottleneckLink(self, newStream=0):
         minThroughput = self.links[0].getFairThroughput(newStream)
-        self.bottleneckLink = self.links[0]
+        bnLink = self.links[0]
         if sg.args.parallel and self.useParallel:
             t1 = time.time()
             data = ((link, self.links.index(link), newStream) for link in self.links)
@@ -537,7 +628,7 @@ class netDataStream:
                     sg.calcFairThroughput, data):
                 if thr < minThroughput:
                     minThroughput = thr
-                    self.bottleneckLink = self.links[link_index]
+                    bnLink = self.links[link_index]
             tdur = time.time() - t1
             if tdur > self.tSeq:
                 self.useParallel = False
@@ -550,7 +641,7 @@ class netDataStream:
                 tempRateVal = l.getFairThroughput(newStream)
                 if tempRateVal < minThroughput:
                     minThroughput = tempRateVal
-                    self.bottleneckLink = l
+                    bnLink = l
             tdur = time.time() - t1
             if tdur > self.tParal:
                 self.useParallel = True
@@ -562,10 +653,33 @@ class netDataStream:
                 tempRateVal = l.getFairThroughput(newStream)
                 if tempRateVal < minThroughput:
                     minThroughput = tempRateVal
-                    self.bottleneckLink = l
+                    bnLink = l
+        self.setBottleneckLink(bnLink)
         return minThroughput
 
+    def setBottleneckLink(self, bnLink):
+        if bnLink is not self.bottleneckLink:
+            oldBnLink = self.bottleneckLink
+            self.bottleneckLink = bnLink
+            if oldBnLink is not None:
+                oldBnLink.updateStreamBottleneck(self)
+            bnLink.updateStreamBottleneck(self)
+        return
+
     def process(self, ev):
+        if self.timers is None or ev.eid not in self.queuedTimers:
+            self.processEvent(ev)
+            return
+        # a queued timer of the stream fired
+        self.queuedTimers.remove(ev.eid)
+        self.timerRemoved(ev)
+        self.timerFiring = True
+        self.processEvent(ev)
+        self.timerFiring = False
+        self.scheduleTimer()
+        return
+
+    def processEvent(self, ev):
         if ev.type == sg.EVENT_STREAM_START:
             self.beingTransmitted = True
             self.transmitPoint = ev.time
@@ -577,7 +691,9 @@ class netDataStream:
             self.eventRef_trComplete = None
             self.setTransmitRate(0, ev.time)
             for link in self.links:
-                link.netDataStreams.remove(self)
+                link.detachStream(self)
+            if sg.simRef.reallocator is not None:
+                sg.simRef.reallocator.markDirty(self.links, ev.time)
             if self.connectedToCache:
                 self.upCacheRef.detachNetDataStream(self, ev.time)
             if self.streamType == sg.STREAM_NOISE:
@@ -585,7 +701,8 @@ class netDataStream:
                 if sg.simRef.simulatorReady \
                         and not sg.simRef.simulationDone:
                     newEv = sg.urRef.getNoiseEvent(ev.time)
-                    sg.simRef.eventPush(newEv)
+                    if newEv is not None:
+                        sg.simRef.eventPush(newEv)
             elif self.streamType == sg.STREAM_NORMAL:
                 sg.urRef.activeStreams -= 1
             if not sg.urRef.streamGenActive and (
@@ -602,7 +719,7 @@ class netDataStream:
                     sg.EVENT_STREAM_EXPAND,
                     self
                 )
-                sg.simRef.eventPush(self.eventRef_expand)
+                self.timerPush(self.eventRef_expand)
             else:
                 self.eventRef_expand = None
             return
@@ -38,16 +38,149 @@ POSSIBILITY OF SUCH DAMAGES.
 """
 
 
-import networkx
+import bisect
+import heapq
 
 import sim_globals as sg
+import sim_event as se
+import netRoutes
+from streamList import streamList
+
+
+class rateIndex:
+
+    #   sorted multiset of transmit rates kept in blocks of up to
+    #   2 * blockSize values with per-block sizes, sums and max. values.
+    #   Prefix sizes and sums over the blocks are kept in a Fenwick tree:
+    #   insert/remove update one block and O(log n) tree nodes, the tree is
+    #   rebuilt only when a block is split or dropped. 'countSumBelow' is a
+    #   bisect over the blocks, a tree prefix and a part of one block
+
+    blockSize = 256
+
+    def __init__(self):
+        self.blocks = []
+        self.blockLens = []
+        self.blockSums = []
+        self.blockMaxes = []
+        self.treeLens = [0]
+        self.treeSums = [0.0]
+        self.size = 0
+        return
+
+    def __len__(self):
+        return self.size
+
+    def rebuildTree(self):
+        n = len(self.blocks)
+        treeLens = [0] + self.blockLens
+        treeSums = [0.0] + self.blockSums
+        for i in xrange(1, n + 1):
+            j = i + (i & -i)
+            if j <= n:
+                treeLens[j] += treeLens[i]
+                treeSums[j] += treeSums[i]
+        self.treeLens = treeLens
+        self.treeSums = treeSums
+        return
+
+    def updateTree(self, i, dLen, dSum):
+        treeLens = self.treeLens
+        treeSums = self.treeSums
+        n = len(treeLens) - 1
+        i += 1
+        while i <= n:
+            treeLens[i] += dLen
+            treeSums[i] += dSum
+            i += i & -i
+        return
+
+    def prefix(self, i):
+        # number and sum of the values in the first i blocks
+        treeLens = self.treeLens
+        treeSums = self.treeSums
+        count = 0
+        total = 0.0
+        while i > 0:
+            count += treeLens[i]
+            total += treeSums[i]
+            i -= i & -i
+        return count, total
+
+    def insert(self, val):
+        self.size += 1
+        if not self.blocks:
+            self.blocks.append([val])
+            self.blockLens.append(1)
+            self.blockSums.append(val)
+            self.blockMaxes.append(val)
+            self.rebuildTree()
+            return
+        i = bisect.bisect_left(self.blockMaxes, val)
+        if i == len(self.blocks):
+            i -= 1
+        block = self.blocks[i]
+        bisect.insort(block, val)
+        if len(block) > 2 * self.blockSize:
+            newBlock = block[self.blockSize:]
+            del block[self.blockSize:]
+            self.blocks.insert(i + 1, newBlock)
+            self.blockLens.insert(i + 1, len(newBlock))
+            self.blockSums.insert(i + 1, sum(newBlock))
+            self.blockMaxes.insert(i + 1, newBlock[-1])
+            self.blockLens[i] = len(block)
+            self.blockSums[i] = sum(block)
+            self.blockMaxes[i] = block[-1]
+            self.rebuildTree()
+            return
+        self.blockLens[i] += 1
+        self.blockSums[i] += val
+        self.blockMaxes[i] = block[-1]
+        self.updateTree(i, 1, val)
+        return
+
+    def remove(self, val):
+        self.size -= 1
+        i = bisect.bisect_left(self.blockMaxes, val)
+        block = self.blocks[i]
+        j = bisect.bisect_left(block, val)
+        assert block[j] == val
+        del block[j]
+        if block:
+            self.blockLens[i] -= 1
+            self.blockSums[i] -= val
+            self.blockMaxes[i] = block[-1]
+            self.updateTree(i, -1, -val)
+        else:
+            del self.blocks[i]
+            del self.blockLens[i]
+            del self.blockSums[i]
+            del self.blockMaxes[i]
+            self.rebuildTree()
+        return
+
+    def countSumBelow(self, val):
+        # number and sum of the rates < val
+        i = bisect.bisect_left(self.blockMaxes, val)
+        count, total = self.prefix(i)
+        if i < len(self.blocks):
+            block = self.blocks[i]
+            j = bisect.bisect_left(block, val)
+            count += j
+            total += sum(block[:j])
+        return count, total
 
 
 class netLink:
 
     def __init__(self, ca, as_nodeA, as_nodeB, l_id=None):
         self.capacity = float(ca)
-        self.netDataStreams = []
+        self.netDataStreams = streamList()
+        # streams bottlenecked at this link and rates of the others,
+        # the latter are the candidates to exclude from the fair share
+        self.bnStreamIDs = set()
+        self.otherBnRates = rateIndex()
+        self.otherBnStreams = dict()  # id(stream) -> rate in otherBnRates
         self.id = l_id
         if l_id is not None:
             return
@@ -80,11 +213,7 @@ class netLink:
 
     def getHopsTo(self, link):
         assert link != self
-        path = networkx.shortest_path(
-            sg.gnGraph.netGraph,
-            self.as_nodeA,
-            link.as_nodeA
-        )
+        path, links = netRoutes.shortestRoute(self.as_nodeA, link.as_nodeA)
         path.remove(self.as_nodeA)
         path.remove(link.as_nodeA)
         if self.as_nodeB in path:
@@ -93,6 +222,42 @@ class netLink:
             path.remove(link.as_nodeB)
         return len(path) + 1
 
+    def attachStream(self, stream):
+        self.netDataStreams.append(stream)
+        if stream.bottleneckLink is self:
+            self.bnStreamIDs.add(id(stream))
+        else:
+            self.otherBnStreams[id(stream)] = stream.transmitRate
+            self.otherBnRates.insert(stream.transmitRate)
+        return
+
+    def detachStream(self, stream):
+        self.netDataStreams.remove(stream)
+        if id(stream) in self.bnStreamIDs:
+            self.bnStreamIDs.remove(id(stream))
+        else:
+            self.otherBnRates.remove(self.otherBnStreams.pop(id(stream)))
+        return
+
+    def updateStreamRate(self, stream):
+        if id(stream) in self.otherBnStreams:
+            self.otherBnRates.remove(self.otherBnStreams[id(stream)])
+            self.otherBnStreams[id(stream)] = stream.transmitRate
+            self.otherBnRates.insert(stream.transmitRate)
+        return
+
+    def updateStreamBottleneck(self, stream):
+        # 'stream' became or stopped being bottlenecked at this link
+        if stream.bottleneckLink is self:
+            if id(stream) in self.otherBnStreams:
+                self.otherBnRates.remove(self.otherBnStreams.pop(id(stream)))
+                self.bnStreamIDs.add(id(stream))
+        elif id(stream) in self.bnStreamIDs:
+            self.bnStreamIDs.remove(id(stream))
+            self.otherBnStreams[id(stream)] = stream.transmitRate
+            self.otherBnRates.insert(stream.transmitRate)
+        return
+
     def getFairThroughput(self, nNew):
         res = self.capacity
         if sg.BACKBONE_LINKS_INF_CAPACITY:
@@ -100,11 +265,9 @@ class netLink:
         nStreams = len(self.netDataStreams) + nNew
         if len(self.netDataStreams) > 0:
             share = self.capacity / nStreams
-            nExcludeStreams = 0
-            for s in self.netDataStreams:
-                if s.bottleneckLink.id != self.id and s.transmitRate < share:
-                    nExcludeStreams += 1
-                    res -= s.transmitRate
+            nExcludeStreams, excludedRate = \
+                self.otherBnRates.countSumBelow(share)
+            res -= excludedRate
             if nExcludeStreams != nStreams:
                 res /= (nStreams - nExcludeStreams)
         return res
@@ -120,3 +283,98 @@ class netLink:
     def process(self, ev):
         # nothing
         return
+
+
+class bandwidthReallocator:
+
+    #   event-driven alternative to the periodic EVENT_STREAM_EXPAND polling:
+    #   links are marked dirty when streams start or complete on them or when
+    #   a stream crossing them lowers its rate; then every stream crossing a
+    #   dirty link tries to use its max. fair rate once. Links made dirty by
+    #   the reallocation itself are handled one EXPAND_INTERVAL later, which
+    #   keeps rate cascades from looping within one instant
+
+    def __init__(self):
+        self.dirtyLinks = []
+        self.dirtyLinkIDs = set()
+        self.reallocating = False
+        self.eventRef_reallocate = None
+        return
+
+    def markDirty(self, links, curTime):
+        for l in links:
+            if l.id not in self.dirtyLinkIDs:
+                self.dirtyLinkIDs.add(l.id)
+                self.dirtyLinks.append(l)
+        if self.reallocating:
+            evTime = curTime + sg.EXPAND_INTERVAL
+        else:
+            evTime = curTime
+        if self.eventRef_reallocate is None:
+            self.eventRef_reallocate = se.event(
+                evTime,
+                id(self),
+                sg.EVENT_LINKS_REALLOCATE,
+                self
+            )
+            sg.simRef.eventPush(self.eventRef_reallocate)
+        else:
+            sg.simRef.eventUpdateTime(self.eventRef_reallocate, evTime)
+        return
+
+    def process(self, ev):
+        if ev.type == sg.EVENT_LINKS_REALLOCATE:
+            self.eventRef_reallocate = None
+            links = self.dirtyLinks
+            self.dirtyLinks = []
+            self.dirtyLinkIDs = set()
+            streams = []
+            seen = set()
+            for l in links:
+                for s in l.netDataStreams:
+                    if id(s) not in seen:
+                        seen.add(id(s))
+                        streams.append(s)
+            self.reallocating = True
+            for s in streams:
+                if s.beingTransmitted:
+                    s.tryUseMaxTRate(ev.time)
+            self.reallocating = False
+        else:
+            raise Exception("Unknown event type:" + str(ev.type))
+        return
+
+
+class rateCascade:
+
+    #   hierarchical caches: when the rate of a cache stream changes, its
+    #   dependents (streams of the lower cache, some of them cache streams
+    #   again) are not re-rated at once. The cache stream is queued and the
+    #   queue is flushed after the event, caches closer to the content
+    #   provider first: a parent cache is always closer to the provider than
+    #   the caches it feeds, so every dependent is re-rated once per flush
+    #   after all of its upstream rates are final
+
+    def __init__(self):
+        self.queue = []
+        self.queued = set()
+        self.seq = 0
+        return
+
+    def add(self, cacheStream):
+        if id(cacheStream) not in self.queued:
+            self.queued.add(id(cacheStream))
+            self.seq += 1
+            heapq.heappush(
+                self.queue,
+                (cacheStream.downCacheRef.depth, self.seq, cacheStream)
+            )
+        return
+
+    def flush(self, curTime):
+        while self.queue:
+            _, _, cacheStream = heapq.heappop(self.queue)
+            self.queued.discard(id(cacheStream))
+            cacheStream.downCacheRef.updateDependentStreams(
+                cacheStream, curTime)
+        return
@@ -0,0 +1,202 @@
+"""
+    CDNSim
+
+file: netRoutes.py
+
+    NEC Europe Ltd. PROPRIETARY INFORMATION
+
+This software is supplied under the terms of a license agreement
+or nondisclosure agreement with NEC Europe Ltd. and may not be
+copied or disclosed except in accordance with the terms of that
+agreement. The software and its source code contain valuable trade
+secrets and confidential information which have to be maintained in
+confidence.
+Any unauthorized publication, transfer to third parties or duplication
+of the object or source code - either totally or in part - is
+prohibited.
+
+    Copyright (c) 2016 NEC Europe Ltd. All Rights Reserved.
+
+Author: Anton Ivanov <anton.ivanov@neclab.eu>
+
+NEC Europe Ltd. DISCLAIMS ALL WARRANTIES, EITHER EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO IMPLIED WARRANTIES OF MERCHANTABILITY
+AND FITNESS FOR A PARTICULAR PURPOSE AND THE WARRANTY AGAINST LATENT
+DEFECTS, WITH RESPECT TO THE PROGRAM AND THE ACCOMPANYING
+DOCUMENTATION.
+
+No Liability For Consequential Damages IN NO EVENT SHALL NEC Europe
+Ltd., NEC Corporation OR ANY OF ITS SUBSIDIARIES BE LIABLE FOR ANY
+DAMAGES WHATSOEVER (INCLUDING, WITHOUT LIMITATION, DAMAGES FOR LOSS
+OF BUSINESS PROFITS, BUSINESS INTERRUPTION, LOSS OF INFORMATION, OR
+OTHER PECUNIARY LOSS AND INDIRECT, CONSEQUENTIAL, INCIDENTAL,
+ECONOMIC OR PUNITIVE DAMAGES) ARISING OUT OF THE USE OF OR INABILITY
+TO USE THIS PROGRAM, EVEN IF NEC Europe Ltd. HAS BEEN ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGES.
+
+    THIS HEADER MAY NOT BE EXTRACTED OR MODIFIED IN ANY WAY.
+"""
+
+import collections
+
+import sim_globals as sg
+import netLink as nl
+
+
+def getLink(edgeID, nodeA, nodeB):
+    gnGraph = sg.gnGraph
+    link = gnGraph.edgeLinks[edgeID]
+    # Creating a link between node A and B, if it does not exist yet
+    if link is None:
+        # if one of the nodes is an 'access' AS node then the link
+        # speed is set to BACKBONE_LINK_BANDWIDTH
+        if gnGraph.asIsAccess[gnGraph.asIndex[nodeA]] or \
+                gnGraph.asIsAccess[gnGraph.asIndex[nodeB]]:
+            link = nl.netLink(sg.BACKBONE_LINK_BANDWIDTH, nodeA, nodeB)
+        else:
+            link = nl.netLink(sg.FAST_BACKBONE_LINK_BANDWIDTH, nodeA, nodeB)
+        gnGraph.edgeLinks[edgeID] = link
+    return link
+
+
+def resolveRoute(nodes, edges):
+    #   AS-index path and edge ids -> (AS path, netLink objects)
+    asNums = sg.gnGraph.asNums
+    path = [int(asNums[i]) for i in nodes]
+    links = [getLink(e, a, b) for e, a, b in zip(edges, path, path[1:])]
+    return path, links
+
+
+def shortestRoute(srcAS, dstAS):
+    #   BFS over the CSR index from the source until the destination is met
+    gnGraph = sg.gnGraph
+    src = gnGraph.asIndex[srcAS]
+    dst = gnGraph.asIndex[dstAS]
+    indptr = gnGraph.csrIndptr
+    indices = gnGraph.csrIndices
+    edgeIDs = gnGraph.csrEdgeIDs
+    parent = {src: (None, None)}
+    queue = collections.deque([src])
+    while queue and dst not in parent:
+        n = queue.popleft()
+        for k in xrange(indptr[n], indptr[n + 1]):
+            m = int(indices[k])
+            if m not in parent:
+                parent[m] = (n, int(edgeIDs[k]))
+                queue.append(m)
+    nodes = [dst]
+    edges = []
+    while nodes[-1] != src:
+        n, e = parent[nodes[-1]]
+        nodes.append(n)
+        edges.append(e)
+    nodes.reverse()
+    edges.reverse()
+    return resolveRoute(nodes, edges)
+
+
+class providerRoutes:
+
+    #   BFS tree rooted at the content provider: a single pass over the CSR
+    #   index answers every 'AS -> content provider' query. Routes (AS path
+    #   and netLink objects) are resolved on first use and memoized.
+    #   Cache nodes are leaves outside of the index and never lie on a route
+
+    def __init__(self, gnGraph):
+        self.gnGraph = gnGraph
+        self.root = None
+        self.parent = []
+        self.parentEdge = []
+        self.routes = dict()
+        self.build()
+        return
+
+    def build(self):
+        gnGraph = self.gnGraph
+        indptr = gnGraph.csrIndptr.tolist()
+        indices = gnGraph.csrIndices.tolist()
+        edgeIDs = gnGraph.csrEdgeIDs.tolist()
+        self.root = gnGraph.contentProvider
+        root = gnGraph.asIndex[self.root]
+        self.parent = [-1] * len(gnGraph.asNums)
+        self.parentEdge = [-1] * len(gnGraph.asNums)
+        self.parent[root] = root
+        self.routes = dict()
+        queue = collections.deque([root])
+        while queue:
+            n = queue.popleft()
+            for k in xrange(indptr[n], indptr[n + 1]):
+                m = indices[k]
+                if self.parent[m] < 0:
+                    self.parent[m] = n
+                    self.parentEdge[m] = edgeIDs[k]
+                    queue.append(m)
+        return
+
+    def getRoute(self, asNum):
+        if self.root != self.gnGraph.contentProvider:
+            self.build()
+        if asNum in self.routes:
+            return self.routes[asNum]
+        nodes = [self.gnGraph.asIndex[asNum]]
+        edges = []
+        while self.parentEdge[nodes[-1]] >= 0:
+            edges.append(self.parentEdge[nodes[-1]])
+            nodes.append(self.parent[nodes[-1]])
+        route = resolveRoute(nodes, edges)
+        self.routes[asNum] = route
+        return route
+
+
+class routeCache:
+
+    #   memoized 'shortestRoute' for arbitrary (source AS, destination AS)
+    #   pairs: at most 'capacity' routes are kept and the least recently
+    #   used one is evicted first
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.routes = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        return
+
+    def getRoute(self, srcAS, dstAS):
+        key = (srcAS, dstAS)
+        route = self.routes.pop(key, None)
+        if route is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            route = shortestRoute(srcAS, dstAS)
+            if self.capacity <= 0:
+                return route
+            if len(self.routes) >= self.capacity:
+                self.routes.popitem(last=False)
+        self.routes[key] = route
+        return route
+
+
+class routeService:
+
+    #   single entry point for stream routing: routes to the content provider
+    #   come from the provider's BFS tree, all others from the LRU cache
+
+    def __init__(self, gnGraph, cacheCapacity):
+        self.gnGraph = gnGraph
+        self.providerRoutes = providerRoutes(gnGraph)
+        self.routeCache = routeCache(cacheCapacity)
+        return
+
+    def getRoute(self, srcAS, dstAS):
+        if dstAS == self.gnGraph.contentProvider:
+            return self.providerRoutes.getRoute(srcAS)
+        return self.routeCache.getRoute(srcAS, dstAS)
+
+    def getStats(self):
+        return "provider routes: " + \
+            str(len(self.providerRoutes.routes)) + \
+            ", route cache: " + str(len(self.routeCache.routes)) + "/" + \
+            str(self.routeCache.capacity) + \
+            " routes, hits: " + str(self.routeCache.hits) + \
+            ", misses: " + str(self.routeCache.misses)
@@ -0,0 +1,175 @@
+"""
+    CDNSim
+
+file: prefixTable.py
+
+    NEC Europe Ltd. PROPRIETARY INFORMATION
+
+This software is supplied under the terms of a license agreement
+or nondisclosure agreement with NEC Europe Ltd. and may not be
+copied or disclosed except in accordance with the terms of that
+agreement. The software and its source code contain valuable trade
+secrets and confidential information which have to be maintained in
+confidence.
+Any unauthorized publication, transfer to third parties or duplication
+of the object or source code - either totally or in part - is
+prohibited.
+
+    Copyright (c) 2016 NEC Europe Ltd. All Rights Reserved.
+
+Author: Anton Ivanov <anton.ivanov@neclab.eu>
+
+NEC Europe Ltd. DISCLAIMS ALL WARRANTIES, EITHER EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO IMPLIED WARRANTIES OF MERCHANTABILITY
+AND FITNESS FOR A PARTICULAR PURPOSE AND THE WARRANTY AGAINST LATENT
+DEFECTS, WITH RESPECT TO THE PROGRAM AND THE ACCOMPANYING
+DOCUMENTATION.
+
+No Liability For Consequential Damages IN NO EVENT SHALL NEC Europe
+Ltd., NEC Corporation OR ANY OF ITS SUBSIDIARIES BE LIABLE FOR ANY
+DAMAGES WHATSOEVER (INCLUDING, WITHOUT LIMITATION, DAMAGES FOR LOSS
+OF BUSINESS PROFITS, BUSINESS INTERRUPTION, LOSS OF INFORMATION, OR
+OTHER PECUNIARY LOSS AND INDIRECT, CONSEQUENTIAL, INCIDENTAL,
+ECONOMIC OR PUNITIVE DAMAGES) ARISING OUT OF THE USE OF OR INABILITY
+TO USE THIS PROGRAM, EVEN IF NEC Europe Ltd. HAS BEEN ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGES.
+
+    THIS HEADER MAY NOT BE EXTRACTED OR MODIFIED IN ANY WAY.
+"""
+
+
+import socket
+import struct
+
+import numpy
+
+
+def ip2int(address):
+    return struct.unpack('!I', socket.inet_aton(address))[0]
+
+
+def int2ip(address):
+    return socket.inet_ntoa(struct.pack('!I', address))
+
+
+class prefixTable:
+
+    #   longest-prefix-match table over IPv4 prefixes: nested prefixes are
+    #   flattened into elementary address intervals (a boundary at every
+    #   prefix start and end), so a lookup is one binary search over 'starts'.
+    #   'values[i]' holds the value of the longest prefix covering
+    #   [starts[i], starts[i+1]), or -1 if none does
+
+    def __init__(self, starts=None, values=None):
+        if starts is None:
+            starts = numpy.zeros(1, dtype=numpy.int64)
+            values = numpy.array([-1], dtype=numpy.int64)
+        self.starts = starts
+        self.values = values
+        return
+
+    @classmethod
+    def build(cls, prefixes):
+        #   'prefixes' is an iterable of (network, prefix length, value) with
+        #   integer network addresses, the last value given for a prefix wins
+        unique = dict()
+        for net, plen, val in prefixes:
+            size = 1 << (32 - plen)
+            net &= ~(size - 1) & 0xFFFFFFFF
+            unique[(net, plen)] = (net + size, val)
+        starts = [0]
+        values = [-1]
+
+        def setFrom(addr, val):
+            if starts[-1] == addr:
+                values[-1] = val
+            elif addr < (1 << 32):
+                starts.append(addr)
+                values.append(val)
+
+        #   sorted by start, enclosing prefixes first: 'stack' holds the
+        #   prefixes covering the current address, innermost last. When a
+        #   prefix ends, the address range falls back to its parent
+        stack = []
+
+        def popUntil(addr):
+            while stack and stack[-1][0] <= addr:
+                end = stack.pop()[0]
+                setFrom(end, stack[-1][1] if stack else -1)
+            return
+
+        for net, plen in sorted(unique):
+            end, val = unique[(net, plen)]
+            popUntil(net)
+            setFrom(net, val)
+            stack.append((end, val))
+        popUntil(1 << 32)
+        return cls(
+            numpy.array(starts, dtype=numpy.int64),
+            numpy.array(values, dtype=numpy.int64)
+        )
+
+    def __len__(self):
+        return len(self.starts)
+
+    def lookup(self, address):
+        # integer address -> value, or -1 if no prefix covers it
+        return int(self.values[self.starts.searchsorted(address, 'right') - 1])
+
+    def probesOwned(self, netStarts, netEnds, owners, step):
+        #   vectorized test, for every range [netStarts, netEnds), that all
+        #   probe addresses 'x = 1 (mod step)' inside it map to 'owners'.
+        #   The probes in each elementary interval are counted, intervals
+        #   are sorted by (owner, start) and prefix-summed: the probes of an
+        #   owner below an address are then one binary search away
+        def probesBelow(x):
+            return (x + step - 2) // step
+
+        ends = numpy.append(self.starts[1:], 1 << 32)
+        ownerIDs, ranks = numpy.unique(self.values, return_inverse=True)
+        order = numpy.lexsort((self.starts, ranks))
+        keys = ranks[order].astype(numpy.int64) * (1 << 32) + \
+            self.starts[order]
+        intervalEnds = ends[order]
+        cumProbes = numpy.concatenate((
+            [0],
+            numpy.cumsum(probesBelow(intervalEnds) -
+                         probesBelow(self.starts[order]))
+        ))
+        # owners without any interval own no probes
+        queryRanks = ownerIDs.searchsorted(owners)
+        queryRanks[queryRanks == len(ownerIDs)] = 0
+        known = ownerIDs[queryRanks] == owners
+
+        def ownedBelow(x):
+            j = keys.searchsorted(queryRanks * (1 << 32) + x, 'left')
+            prev = numpy.maximum(j - 1, 0)
+            # the last interval starting below 'x' may reach past it
+            overshoot = numpy.where(
+                (j > 0) & (keys[prev] >> 32 == queryRanks),
+                numpy.maximum(probesBelow(intervalEnds[prev]) -
+                              probesBelow(x), 0),
+                0
+            )
+            return cumProbes[j] - overshoot
+
+        netStarts = numpy.asarray(netStarts, dtype=numpy.int64)
+        netEnds = numpy.asarray(netEnds, dtype=numpy.int64)
+        owned = ownedBelow(netEnds) - ownedBelow(netStarts)
+        total = probesBelow(netEnds) - probesBelow(netStarts)
+        return known & (owned == total)
+
+    def __getitem__(self, address):
+        #   dotted string or integer address, as the SubnetTree interface
+        #   it replaces: KeyError if no prefix covers the address
+        if isinstance(address, basestring):
+            address = ip2int(address)
+        val = self.lookup(address)
+        if val < 0:
+            raise KeyError(address)
+        return val
+
+    def __contains__(self, address):
+        if isinstance(address, basestring):
+            address = ip2int(address)
+        return self.lookup(address) >= 0
@@ -0,0 +1,269 @@
+"""
+    CDNSim
+
+file: requestGenerator.py
+
+    NEC Europe Ltd. PROPRIETARY INFORMATION
+
+This software is supplied under the terms of a license agreement
+or nondisclosure agreement with NEC Europe Ltd. and may not be
+copied or disclosed except in accordance with the terms of that
+agreement. The software and its source code contain valuable trade
+secrets and confidential information which have to be maintained in
+confidence.
+Any unauthorized publication, transfer to third parties or duplication
+of the object or source code - either totally or in part - is
+prohibited.
+
+    Copyright (c) 2016 NEC Europe Ltd. All Rights Reserved.
+
+Author: Anton Ivanov <anton.ivanov@neclab.eu>
+
+NEC Europe Ltd. DISCLAIMS ALL WARRANTIES, EITHER EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO IMPLIED WARRANTIES OF MERCHANTABILITY
+AND FITNESS FOR A PARTICULAR PURPOSE AND THE WARRANTY AGAINST LATENT
+DEFECTS, WITH RESPECT TO THE PROGRAM AND THE ACCOMPANYING
+DOCUMENTATION.
+
+No Liability For Consequential Damages IN NO EVENT SHALL NEC Europe
+Ltd., NEC Corporation OR ANY OF ITS SUBSIDIARIES BE LIABLE FOR ANY
+DAMAGES WHATSOEVER (INCLUDING, WITHOUT LIMITATION, DAMAGES FOR LOSS
+OF BUSINESS PROFITS, BUSINESS INTERRUPTION, LOSS OF INFORMATION, OR
+OTHER PECUNIARY LOSS AND INDIRECT, CONSEQUENTIAL, INCIDENTAL,
+ECONOMIC OR PUNITIVE DAMAGES) ARISING OUT OF THE USE OF OR INABILITY
+TO USE THIS PROGRAM, EVEN IF NEC Europe Ltd. HAS BEEN ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGES.
+
+    THIS HEADER MAY NOT BE EXTRACTED OR MODIFIED IN ANY WAY.
+"""
+
+
+import hashlib
+import math
+
+import sim_globals as sg
+import binCache as bc
+
+WORKLOAD_FORMAT = 'workload'
+
+
+class aliasTable:
+
+    #   Walker/Vose alias method: O(1) draws from a discrete distribution,
+    #   used for the truncated channel (zipf) and stream rate (poisson)
+    #   distributions instead of rejection loops
+
+    def __init__(self, weights):
+        n = len(weights)
+        total = float(sum(weights))
+        scaled = [w * n / total for w in weights]
+        self.prob = [1.0] * n
+        self.alias = range(n)
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            if scaled[l] < 1.0:
+                small.append(l)
+            else:
+                large.append(l)
+        self.prob = sg.numpy.array(self.prob)
+        self.alias = sg.numpy.array(self.alias)
+        return
+
+    def sample(self, size):
+        i = sg.numpy.random.randint(0, len(self.prob), size)
+        u = sg.numpy.random.random_sample(size)
+        return sg.numpy.where(u < self.prob[i], i, self.alias[i])
+
+
+def channelTable():
+    # zipf(1.2) - 1, truncated to the channel numbers
+    return aliasTable([(c + 1) ** -1.2 for c in range(sg.NUMBER_CHANNELS)])
+
+
+def rateTable():
+    # poisson(2), truncated to the indexes of STREAM_RATES
+    return aliasTable([2.0 ** k / math.factorial(k)
+                       for k in range(len(sg.STREAM_RATES))])
+
+
+class requestGenerator:
+
+    #   user requests (inter-arrival gap, host, stream rate, playback time,
+    #   channel) drawn in blocks of REQUEST_BLOCK_SIZE and handed out one by
+    #   one. After a request rate change the gaps not handed out yet are
+    #   redrawn, so every arrival uses the rate in effect when it is made
+
+    def __init__(self, hostRanges, rate):
+        self.hostRanges = hostRanges
+        self.rate = rate
+        self.channels = channelTable()
+        self.rates = rateTable()
+        self.block = []
+        self.gaps = []
+        self.next = 0
+        return
+
+    def setRate(self, rate):
+        self.rate = rate
+        if self.next < len(self.gaps):
+            self.gaps[self.next:] = sg.numpy.random.standard_gamma(
+                1.0 / rate,
+                len(self.gaps) - self.next
+            ).tolist()
+        return
+
+    def refill(self):
+        size = sg.REQUEST_BLOCK_SIZE
+        self.gaps = sg.numpy.random.standard_gamma(
+            1.0 / self.rate, size).tolist()
+        streamRates = sg.numpy.array(sg.STREAM_RATES)[
+            self.rates.sample(size)]
+        self.block = zip(
+            self.hostRanges.sampleArray(size).tolist(),
+            streamRates.tolist(),
+            sg.numpy.random.triangular(
+                sg.MIN_PBK_TIME,
+                sg.MOD_PBK_TIME,
+                sg.MAX_PBK_TIME,
+                size
+            ).tolist(),
+            self.channels.sample(size).tolist()
+        )
+        self.next = 0
+        return
+
+    def pop(self):
+        #   -> (gap, (host, stream rate, playback time, channel))
+        if self.next == len(self.block):
+            self.refill()
+        i = self.next
+        self.next += 1
+        return self.gaps[i], self.block[i]
+
+
+def hostsDigest(hostRanges):
+    #   a saved workload only fits the host population it was made for
+    digest = hashlib.sha1()
+    digest.update(sg.numpy.asarray(hostRanges.starts, dtype='<i8').tostring())
+    digest.update(sg.numpy.asarray(hostRanges.counts, dtype='<i8').tostring())
+    return digest.hexdigest()
+
+
+class workloadRecorder:
+
+    #   user requests of a run (arrival time, host, stream rate, data size,
+    #   channel) and its background noise requests (arrival time, host,
+    #   stream rate, data size, server AS), saved as columns for the replay
+    #   with 'workloadReader'
+
+    def __init__(self, fileName, hostRanges, nNoiseStreams):
+        self.fileName = fileName
+        self.hostRanges = hostRanges
+        self.nNoiseStreams = nNoiseStreams
+        self.times = []
+        self.requests = []
+        self.noiseTimes = []
+        self.noiseRequests = []
+        return
+
+    def add(self, tim, request):
+        self.times.append(tim)
+        self.requests.append(request)
+        return
+
+    def addNoise(self, tim, request):
+        self.noiseTimes.append(tim)
+        self.noiseRequests.append(request)
+        return
+
+    def save(self):
+        columns = zip(*self.requests) or [(), (), (), ()]
+        hosts, streamRates, dataSizes, channels = columns
+        columns = zip(*self.noiseRequests) or [(), (), (), ()]
+        noiseHosts, noiseRates, noiseSizes, noiseServers = columns
+        bc.write(self.fileName, {
+            'format': WORKLOAD_FORMAT,
+            'hosts': hostsDigest(self.hostRanges),
+            'noise': self.nNoiseStreams
+        }, {
+            'time': sg.numpy.array(self.times, dtype=sg.numpy.float64),
+            'host': sg.numpy.array(hosts, dtype=sg.numpy.int64),
+            'rate': sg.numpy.array(streamRates, dtype=sg.numpy.float64),
+            'size': sg.numpy.array(dataSizes, dtype=sg.numpy.float64),
+            'channel': sg.numpy.array(channels, dtype=sg.numpy.int32),
+            'noiseTime': sg.numpy.array(
+                self.noiseTimes, dtype=sg.numpy.float64),
+            'noiseHost': sg.numpy.array(noiseHosts, dtype=sg.numpy.int64),
+            'noiseRate': sg.numpy.array(noiseRates, dtype=sg.numpy.float64),
+            'noiseSize': sg.numpy.array(noiseSizes, dtype=sg.numpy.float64),
+            'noiseServer': sg.numpy.array(noiseServers, dtype=sg.numpy.int64)
+        })
+        return len(self.times), len(self.noiseTimes)
+
+
+class workloadReader:
+
+    #   replays a saved workload: the memory-mapped columns are converted
+    #   to requests 'blockSize' at a time
+
+    def __init__(self, fileName, hostRanges, nNoiseStreams, blockSize):
+        header = bc.readHeader(fileName)
+        if header is None or header[0].get('format') != WORKLOAD_FORMAT:
+            raise Exception("Not a workload file: " + fileName)
+        if header[0]['hosts'] != hostsDigest(hostRanges):
+            raise Exception(
+                "Workload " + fileName + " was saved for other hosts"
+                " (-geo, -nhosts or input files differ)"
+            )
+        if header[0]['noise'] != nNoiseStreams:
+            raise Exception(
+                "Workload " + fileName + " was saved with -backnoise " +
+                str(header[0]['noise'])
+            )
+        self.meta, self.columns = bc.read(fileName)
+        self.blockSize = blockSize
+        self.nRequests = len(self.columns['time'])
+        self.nextBlock = 0
+        self.times = []
+        self.block = []
+        self.next = 0
+        #   one noise request per background stream, read at once
+        self.noiseTimes = self.columns['noiseTime'].tolist()
+        self.noiseRequests = zip(*[
+            self.columns[name].tolist()
+            for name in ('noiseHost', 'noiseRate', 'noiseSize', 'noiseServer')
+        ])
+        self.nextNoise = 0
+        return
+
+    def pop(self):
+        #   -> (arrival time, (host, stream rate, data size, channel)) or
+        #   None after the last request
+        if self.next == len(self.block):
+            if self.nextBlock >= self.nRequests:
+                return None
+            j = min(self.nextBlock + self.blockSize, self.nRequests)
+            cols = [self.columns[name][self.nextBlock:j].tolist()
+                    for name in ('time', 'host', 'rate', 'size', 'channel')]
+            self.times = cols[0]
+            self.block = zip(*cols[1:])
+            self.nextBlock = j
+            self.next = 0
+        i = self.next
+        self.next += 1
+        return self.times[i], self.block[i]
+
+    def popNoise(self):
+        #   -> (arrival time, (host, stream rate, data size, server AS)) or
+        #   None after the last noise request
+        if self.nextNoise == len(self.noiseTimes):
+            return None
+        i = self.nextNoise
+        self.nextNoise += 1
+        return self.noiseTimes[i], self.noiseRequests[i]
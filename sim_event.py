@@ -41,13 +41,14 @@ import sim_globals as sg
 
 
 class event:
-    __slots__ = ['time', 'objRef_id', 'type', 'eid']
+    __slots__ = ['time', 'objRef_id', 'type', 'eid', 'qEntry']
 
     def __init__(self, tim, objRef_id, typ, objRef=None, eid=None):
         self.time = tim
         self.objRef_id = objRef_id
         self.type = typ
         self.eid = eid
+        self.qEntry = None
         if objRef is not None:
             sg.event_obj_dict[objRef_id] = objRef
             self.eid = sg.globalEventID
@@ -39,7 +39,7 @@
 
 from __future__ import print_function
 import numpy.random
-import random
+import random as pyrandom
 import time
 
 EVENT_RESERVED = 0
@@ -55,6 +55,7 @@ EVENT_CONSUME_BUFFER_EMPTY = 7
 
 #   cacheNode events
 EVENT_CACHE_READY = 8
+EVENT_START_DEPENDENTS = 15
 
 #   userRequests events
 EVENT_USER_REQUEST = 9
@@ -63,6 +64,9 @@ EVENT_CHANGE_REQUEST_RATE = 11
 EVENT_SIM_FINALIZE = 12
 EVENT_PERIODIC_STATS = 13
 
+#   bandwidthReallocator events
+EVENT_LINKS_REALLOCATE = 14
+
 #   event queue keeper actions
 ACTION_DELETE = -1
 ACTION_UPDATE = -2
@@ -71,6 +75,8 @@ ACTION_STOP = -3
 PROPAGATION_DELAY = 0.01
 # Max rates for video streaming quality: 360p, 480p, 720p, 1080p, 2K, 4K
 STREAM_RATES = [1000000, 2500000, 5000000, 8000000, 10000000, 20000000]
+# rate -> index in STREAM_RATES (netDataStream.rateID)
+STREAM_RATE_IDS = dict((r, i) for i, r in enumerate(STREAM_RATES))
 FAST_BACKBONE_LINK_BANDWIDTH = 40000000000.0  # 40 Gbps
 BACKBONE_LINK_BANDWIDTH = 10000000000.0  # 10 Gbps
 BACKBONE_LINKS_INF_CAPACITY = False
@@ -84,6 +90,9 @@ MOD_PBK_TIME = 1800.0   # sec
 MAX_PBK_TIME = 2700.0   # sec
 MEAN_PBK_TIME = (MIN_PBK_TIME + MOD_PBK_TIME + MAX_PBK_TIME) / 3  # sec
 # MEAN_PBK_TIME is valid for triangular distribution
+REQUEST_BLOCK_SIZE = 4096  # user requests drawn at once
+TRACE_CHUNK_SIZE = 4 << 20  # bytes of the trace parsed at once
+TRACE_READ_AHEAD = 8  # parsed trace chunks kept ahead of the simulation
 
 STREAM_NORMAL = 0
 STREAM_NOISE = 1
@@ -114,6 +123,11 @@ NAMES_EVENTS = ['---',
 
 COLORS_EVENTS = []
 
+#   the treap event queue draws its node priorities from the module-level
+#   'random', the simulation uses its own generator to stay independent of
+#   the chosen event queue implementation
+random = pyrandom.Random()
+
 args = None
 urRef = None
 simRef = None
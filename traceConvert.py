@@ -0,0 +1,84 @@
+"""
+    CDNSim
+
+file: traceConvert.py
+
+    NEC Europe Ltd. PROPRIETARY INFORMATION
+
+This software is supplied under the terms of a license agreement
+or nondisclosure agreement with NEC Europe Ltd. and may not be
+copied or disclosed except in accordance with the terms of that
+agreement. The software and its source code contain valuable trade
+secrets and confidential information which have to be maintained in
+confidence.
+Any unauthorized publication, transfer to third parties or duplication
+of the object or source code - either totally or in part - is
+prohibited.
+
+    Copyright (c) 2016 NEC Europe Ltd. All Rights Reserved.
+
+Author: Anton Ivanov <anton.ivanov@neclab.eu>
+
+NEC Europe Ltd. DISCLAIMS ALL WARRANTIES, EITHER EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO IMPLIED WARRANTIES OF MERCHANTABILITY
+AND FITNESS FOR A PARTICULAR PURPOSE AND THE WARRANTY AGAINST LATENT
+DEFECTS, WITH RESPECT TO THE PROGRAM AND THE ACCOMPANYING
+DOCUMENTATION.
+
+No Liability For Consequential Damages IN NO EVENT SHALL NEC Europe
+Ltd., NEC Corporation OR ANY OF ITS SUBSIDIARIES BE LIABLE FOR ANY
+DAMAGES WHATSOEVER (INCLUDING, WITHOUT LIMITATION, DAMAGES FOR LOSS
+OF BUSINESS PROFITS, BUSINESS INTERRUPTION, LOSS OF INFORMATION, OR
+OTHER PECUNIARY LOSS AND INDIRECT, CONSEQUENTIAL, INCIDENTAL,
+ECONOMIC OR PUNITIVE DAMAGES) ARISING OUT OF THE USE OF OR INABILITY
+TO USE THIS PROGRAM, EVEN IF NEC Europe Ltd. HAS BEEN ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGES.
+
+    THIS HEADER MAY NOT BE EXTRACTED OR MODIFIED IN ANY WAY.
+"""
+
+from __future__ import print_function
+from decorations import printWithClock, printInfo
+import argparse
+import sys
+
+import sim_globals as sg
+import traceReader as tr
+
+
+def main(argv=None):
+
+    if argv is None:
+        argv = sys.argv[1:]
+    parser = argparse.ArgumentParser(
+        description='Convert a CDN-Sim user behavior trace to the binary '
+                    'trace format replayed by cdnsim.py -trace',
+        formatter_class=lambda prog: argparse.ArgumentDefaultsHelpFormatter(
+            prog, max_help_position=32
+        )
+    )
+    parser.add_argument('trace', metavar='file',
+                        help='Text user behavior trace (.gz/.bz2 allowed)')
+    parser.add_argument('-out', metavar='file', default='',
+                        help='Binary trace (default: <trace>.bin)')
+    args = parser.parse_args(argv)
+
+    outName = args.out
+    if outName == '':
+        outName = args.trace
+        for ext in ('.gz', '.bz2'):
+            if outName.endswith(ext):
+                outName = outName[:-len(ext)]
+        outName += '.bin'
+    if tr.isBinaryTrace(args.trace):
+        print("already a binary trace: " + args.trace)
+        return -1
+    printWithClock("Converting " + args.trace + " to " + outName)
+    nRequests, nUsers = tr.convertTrace(
+        args.trace, outName, sg.TRACE_CHUNK_SIZE)
+    printInfo(str(nRequests) + " requests, " + str(nUsers) + " users")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
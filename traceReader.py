@@ -0,0 +1,262 @@
+"""
+    CDNSim
+
+file: traceReader.py
+
+    NEC Europe Ltd. PROPRIETARY INFORMATION
+
+This software is supplied under the terms of a license agreement
+or nondisclosure agreement with NEC Europe Ltd. and may not be
+copied or disclosed except in accordance with the terms of that
+agreement. The software and its source code contain valuable trade
+secrets and confidential information which have to be maintained in
+confidence.
+Any unauthorized publication, transfer to third parties or duplication
+of the object or source code - either totally or in part - is
+prohibited.
+
+    Copyright (c) 2016 NEC Europe Ltd. All Rights Reserved.
+
+Author: Anton Ivanov <anton.ivanov@neclab.eu>
+
+NEC Europe Ltd. DISCLAIMS ALL WARRANTIES, EITHER EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO IMPLIED WARRANTIES OF MERCHANTABILITY
+AND FITNESS FOR A PARTICULAR PURPOSE AND THE WARRANTY AGAINST LATENT
+DEFECTS, WITH RESPECT TO THE PROGRAM AND THE ACCOMPANYING
+DOCUMENTATION.
+
+No Liability For Consequential Damages IN NO EVENT SHALL NEC Europe
+Ltd., NEC Corporation OR ANY OF ITS SUBSIDIARIES BE LIABLE FOR ANY
+DAMAGES WHATSOEVER (INCLUDING, WITHOUT LIMITATION, DAMAGES FOR LOSS
+OF BUSINESS PROFITS, BUSINESS INTERRUPTION, LOSS OF INFORMATION, OR
+OTHER PECUNIARY LOSS AND INDIRECT, CONSEQUENTIAL, INCIDENTAL,
+ECONOMIC OR PUNITIVE DAMAGES) ARISING OUT OF THE USE OF OR INABILITY
+TO USE THIS PROGRAM, EVEN IF NEC Europe Ltd. HAS BEEN ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGES.
+
+    THIS HEADER MAY NOT BE EXTRACTED OR MODIFIED IN ANY WAY.
+"""
+
+import threading
+import Queue
+import mmap
+import re
+import os
+
+import numpy
+
+import chunkParser as cp
+import binCache as bc
+
+TRACE_FORMAT = 'trace'
+
+#   ip, ?, ?, start time, ?, ?, play time
+TRACE_LINE = re.compile(
+    r'^(\d+\.\d+\.\d+\.\d+)[ \t]\S+[ \t]\d+'
+    r'[ \t](\d+\.\d+)[ \t]\d+\.\d+[ \t]\d+\.\d+[ \t](\d+)',
+    re.MULTILINE | re.UNICODE
+)
+
+
+#   a trace line without its second field and its digits, closed by '\0'
+TRACE_SHAPE = ' ...  . . .  \0'
+DIGITS = '0123456789'
+
+
+def parseTraceChunk(text):
+    #   ip, start time and play time columns of the lines of 'text'. Chunks
+    #   of well-formed seven-field lines are split and converted column-wise,
+    #   anything else goes through the line regex
+    nLines = text.count('\n')
+    if text and not text.endswith('\n'):
+        nLines += 1
+        text += '\n'
+    #   '\0' closes every line, so a line of more or fewer fields shifts it
+    fields = text.replace('\n', ' \0 ').split()
+    if (len(fields) == 8 * nLines and
+            fields[7::8].count('\0') == nLines and
+            text.count(' ') + text.count('\t') == 6 * nLines):
+        ips = fields[0::8]
+        starts = fields[3::8]
+        plays = fields[6::8]
+        #   the ip and number fields are digit groups split by single dots
+        del fields[1::8]
+        checked = ' ' + ' '.join(fields)
+        if (checked.translate(None, DIGITS) == TRACE_SHAPE * nLines and
+                ' .' not in checked and '. ' not in checked and
+                '..' not in checked):
+            return (ips,
+                    numpy.array(starts, dtype=float).tolist(),
+                    numpy.array(plays, dtype=float).tolist())
+    rows = TRACE_LINE.findall(text)
+    if len(rows) != nLines:
+        for line in text.splitlines():
+            if TRACE_LINE.match(line) is None:
+                raise Exception(
+                    "Unrecognized format of user behavior trace file,"
+                    " line:\n\t>> " + line
+                )
+    return ([ip for ip, _, _ in rows],
+            [float(start) for _, start, _ in rows],
+            [float(play) for _, _, play in rows])
+
+
+def traceChunks(fileName, chunkSize):
+    #   the trace in pieces of about 'chunkSize' bytes ending on a line
+    #   boundary, plain traces are memory-mapped
+    if fileName.endswith('.gz') or fileName.endswith('.bz2'):
+        for text in cp.readBlocks(fileName, chunkSize):
+            yield text
+        return
+    f = open(fileName, 'rb')
+    size = os.fstat(f.fileno()).st_size
+    if size == 0:
+        f.close()
+        return
+    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    start = 0
+    while start < size:
+        end = data.find('\n', min(start + chunkSize, size) - 1)
+        end = size if end < 0 else end + 1
+        yield data[start:end]
+        start = end
+    data.close()
+    f.close()
+    return
+
+
+def isBinaryTrace(fileName):
+    header = bc.readHeader(fileName)
+    return header is not None and header[0].get('format') == TRACE_FORMAT
+
+
+def convertTrace(textName, binName, chunkSize):
+    #   text trace -> columnar binary trace: start time, data size and user
+    #   (masked ip, numbered in the order of first appearance). Returns the
+    #   number of requests and users
+    users = dict()
+    starts = []
+    sizes = []
+    userIdx = []
+    for text in traceChunks(textName, chunkSize):
+        ips, chunkStarts, chunkSizes = parseTraceChunk(text)
+        for ip in ips:
+            userIdx.append(users.setdefault(ip, len(users)))
+        starts.extend(chunkStarts)
+        sizes.extend(chunkSizes)
+    meta = {
+        'format': TRACE_FORMAT,
+        'source': os.path.basename(textName),
+        'sourceDigest': bc.fileDigest(textName),
+        'nUsers': len(users)
+    }
+    bc.write(binName, meta, {
+        'start': numpy.array(starts, dtype=numpy.float64),
+        'size': numpy.array(sizes, dtype=numpy.float64),
+        'user': numpy.array(userIdx, dtype=numpy.int32)
+    })
+    return len(starts), len(users)
+
+
+def openTrace(fileName, chunkSize, readAhead, blockSize):
+    if isBinaryTrace(fileName):
+        return binaryTraceReader(fileName, blockSize)
+    return traceReader(fileName, chunkSize, readAhead)
+
+
+class traceReader:
+
+    #   user behaviour trace read ahead of the simulation: a background
+    #   thread cuts the (memory-mapped or decompressed) trace into chunks
+    #   of about 'chunkSize' bytes and parses them, at most 'readAhead'
+    #   parsed chunks wait in the queue. The simulation only takes a lock
+    #   once per chunk
+
+    def __init__(self, fileName, chunkSize, readAhead):
+        self.fileName = fileName
+        self.chunkSize = chunkSize
+        self.chunks = Queue.Queue(maxsize=readAhead)
+        self.ips = self.starts = self.plays = []
+        self.pos = 0
+        self.done = False
+        self.stopped = False
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+        return
+
+    def run(self):
+        try:
+            for text in traceChunks(self.fileName, self.chunkSize):
+                if self.stopped:
+                    return
+                columns = parseTraceChunk(text)
+                if columns[0]:
+                    self.chunks.put(columns)
+        except Exception as e:
+            self.chunks.put(e)
+        self.chunks.put(None)
+        return
+
+    def next(self):
+        #   next (user, start time, data size) of the trace, None at its
+        #   end. The user is the masked ip
+        i = self.pos
+        while i == len(self.ips):
+            if self.done:
+                return None
+            columns = self.chunks.get()
+            if columns is None:
+                self.done = True
+                return None
+            if isinstance(columns, Exception):
+                self.done = True
+                raise columns
+            self.ips, self.starts, self.plays = columns
+            i = 0
+        self.pos = i + 1
+        return self.ips[i], self.starts[i], self.plays[i]
+
+    def close(self):
+        #   the reader may be blocked on a full queue: drain it
+        self.stopped = True
+        while self.thread.is_alive():
+            try:
+                self.chunks.get(timeout=0.1)
+            except Queue.Empty:
+                pass
+        return
+
+
+class binaryTraceReader:
+
+    #   replays a trace written by convertTrace from the memory-mapped
+    #   columns, converted to lists 'blockSize' requests at a time
+
+    def __init__(self, fileName, blockSize):
+        self.meta, self.columns = bc.read(fileName)
+        self.blockSize = blockSize
+        self.nRequests = len(self.columns['start'])
+        self.nextBlock = 0
+        self.block = ([], [], [])
+        self.pos = 0
+        return
+
+    def next(self):
+        i = self.pos
+        if i == len(self.block[0]):
+            if self.nextBlock >= self.nRequests:
+                return None
+            j = min(self.nextBlock + self.blockSize, self.nRequests)
+            self.block = tuple(
+                self.columns[name][self.nextBlock:j].tolist()
+                for name in ('user', 'start', 'size')
+            )
+            self.nextBlock = j
+            i = 0
+        self.pos = i + 1
+        users, starts, sizes = self.block
+        return users[i], starts[i], sizes[i]
+
+    def close(self):
+        return
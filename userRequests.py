@@ -40,11 +40,8 @@ POSSIBILITY OF SUCH DAMAGES.
 
 from __future__ import print_function
 from decorations import printWithClock, printInfo
-import networkx
-import Queue
 import time
 import csv
-import re
 import os
 
 import sim_globals as sg
@@ -52,17 +49,15 @@ import sim_event as se
 import netLink as nl
 import cacheNode as cn
 import netDataStream as ns
+import requestGenerator as rg
+import traceReader as tr
 
 
 class userRequests:
     def __init__(self, max_hosts, applyManualInputData):
-        self.re = re.compile(
-            '(\d+\.\d+\.\d+\.\d+)\s(\S+)\s(\d+)'
-            '\s(\d+\.\d+)\s(\d+\.\d+)\s(\d+\.\d+)\s(\d+)',
-            re.UNICODE
-        )
-        self.requestQueue = Queue.Queue()
-        self.noiseRequestQueue = Queue.Queue()
+        #   payload of every pending (noise) user request, keyed by the
+        #   id of the event that fires it
+        self.pendingRequests = dict()
         self.traceHostMap = dict()
         self.activeStreams = 0
         self.totalStreams = 0
@@ -79,8 +74,35 @@ class userRequests:
         self.listOfChannels = None
         self.numRequestsPerTimePeriod = 0
         self.streamGenRateScenario = []  # (time, requests per min)
-        self.listOfHosts = sg.gnGraph.populateGeoNetGraph(
+        self.hostRanges = sg.gnGraph.populateGeoNetGraph(
             max_hosts, sg.args.percentCache, applyManualInputData)
+        self.asStats = cn.asCacheStats(len(sg.gnGraph.asNums))
+        self.caches = cn.cacheRegistry()
+        self.requestGen = rg.requestGenerator(
+            self.hostRanges,
+            self.streamGenerationRate
+        )
+        self.trace = None
+        self.workload = None
+        self.workloadLog = None
+        if sg.args.workload != '':
+            if not os.path.isfile(sg.args.workload):
+                print("specified workload file not found: " +
+                      sg.args.workload)
+                exit(-3)
+            printInfo("Replaying the workload: " + sg.args.workload)
+            self.workload = rg.workloadReader(
+                sg.args.workload,
+                self.hostRanges,
+                self.activeNoiseStreamsMax,
+                sg.REQUEST_BLOCK_SIZE
+            )
+        if sg.args.saveWorkload != '':
+            self.workloadLog = rg.workloadRecorder(
+                sg.args.saveWorkload,
+                self.hostRanges,
+                self.activeNoiseStreamsMax
+            )
         if sg.args.scenario != '':
             if os.path.isfile(sg.args.scenario):
                 printInfo("Using a scenaio file: " + sg.args.scenario)
@@ -97,24 +119,37 @@ class userRequests:
                 exit(-3)
         if sg.MODEL_USER_BEHAVIOR is True:
             self.startTime = 0.0
-            self.traceFile = None
             for t, r in self.streamGenRateScenario:
                 sg.simRef.eventPush(
                     se.event(t, id(self), sg.EVENT_CHANGE_REQUEST_RATE, self)
                 )
-            sg.simRef.eventPush(
-                se.event(sg.args.endtime, id(self), sg.EVENT_SIM_FINALIZE, self)
-            )
         else:
-            self.traceFile = open(sg.args.trace, 'r')
+            self.trace = tr.openTrace(
+                sg.args.trace,
+                sg.TRACE_CHUNK_SIZE,
+                sg.TRACE_READ_AHEAD,
+                sg.REQUEST_BLOCK_SIZE
+            )
+        sg.simRef.eventPush(
+            se.event(sg.args.endtime, id(self), sg.EVENT_SIM_FINALIZE, self)
+        )
         sg.simRef.eventPush(
             se.event(1, id(self), sg.EVENT_PERIODIC_STATS, self)
         )
         return
 
     def __del__(self):
-        if self.traceFile is not None:
-            self.traceFile.close()
+        if self.trace is not None:
+            self.trace.close()
+
+    def saveWorkload(self):
+        # at the end of the run: with -backnoise, user requests
+        # are generated until the noise streams are ready
+        if self.workloadLog is not None:
+            nRequests, nNoiseRequests = self.workloadLog.save()
+            printInfo("Saved " + str(nRequests) + " user and " +
+                      str(nNoiseRequests) + " noise requests to " +
+                      sg.args.saveWorkload)
 
     def calcStreamGenRate(self, userRequest=0.0):
         if sg.args.endtime < sg.MEAN_PBK_TIME:
@@ -143,116 +178,96 @@ class userRequests:
         return result
 
     def genChannelNumber(self):
-        channel = sg.numpy.random.zipf(1.2) - 1
-        while channel >= sg.NUMBER_CHANNELS:
-            channel = sg.numpy.random.zipf(1.2) - 1
-        return channel
+        return int(self.requestGen.channels.sample(1)[0])
 
     def getNextEvent(self, curTime):
         if sg.MODEL_USER_BEHAVIOR:
+            if self.workload is not None:
+                request = self.workload.pop()
+                if request is None:
+                    # end of the saved workload: no new streams
+                    self.streamGenActive = False
+                    return None
+                randStartTime, futureRequest = request
+            else:
+                gap, (randHost, randStreamRate, randPlayTime, channel) = \
+                    self.requestGen.pop()
+                randStartTime = curTime + gap
+                futureRequest = (
+                    randHost,
+                    randStreamRate,
+                    randStreamRate * randPlayTime,
+                    channel
+                )
+            if self.workloadLog is not None:
+                self.workloadLog.add(randStartTime, futureRequest)
             self.totalStreams += 1
-            randHost = sg.random.choice(self.listOfHosts).exploded
-            randStartTime = curTime + sg.numpy.random.\
-                standard_gamma(1.0/self.streamGenerationRate)
-            randPlayTime = sg.numpy.random.\
-                triangular(sg.MIN_PBK_TIME, sg.MOD_PBK_TIME, sg.MAX_PBK_TIME)
-            rateN = sg.numpy.random.poisson(2)
-            while rateN > len(sg.STREAM_RATES) - 1:
-                rateN = sg.numpy.random.poisson(2)
-            randStreamRate = sg.STREAM_RATES[rateN]
-            futureRequest = (
-                randHost,
-                randStreamRate,
-                randStreamRate * randPlayTime
-            )
             ev = se.event(randStartTime, id(self), sg.EVENT_USER_REQUEST, self)
         else:
             # If we have a trace file with realistic user events...
-            futureRequestLine = self.traceFile.readline()
-            if futureRequestLine == '':
+            request = self.trace.next()
+            if request is None:
+                # end of the trace: no new streams
+                self.streamGenActive = False
                 return None
-            match = self.re.match(futureRequestLine)
-            if match is not None:
-                if self.startTime is None:
-                    self.startTime = float(match.group(4))
-                # if the trace file is using masked
-                # ip-addresses, we have to re-map them
-                if match.group(1) not in self.traceHostMap:
-                    randHost = sg.random.choice(self.listOfHosts).exploded
-                    self.traceHostMap[match.group(1)] = randHost
-                else:
-                    randHost = self.traceHostMap[match.group(1)]
-                futureRequest = (
-                    randHost,
-                    sg.STREAM_RATES[2],
-                    float(match.group(7))
-                )
-                ev = se.event(
-                    float(match.group(4)) - self.startTime,
-                    id(self),
-                    sg.EVENT_USER_REQUEST,
-                    self
-                )
+            traceUser, traceStartTime, traceDataSize = request
+            if self.startTime is None:
+                self.startTime = traceStartTime
+            # if the trace file is using masked
+            # ip-addresses, we have to re-map them
+            if traceUser not in self.traceHostMap:
+                randHost = self.hostRanges.sample(sg.random)
+                self.traceHostMap[traceUser] = randHost
             else:
-                raise Exception(
-                    "Unrecognized format of user behavior trace file,"
-                    " line:\n\t>> " + futureRequestLine
-                )
-        self.requestQueue.put(futureRequest)
+                randHost = self.traceHostMap[traceUser]
+            futureRequest = (
+                randHost,
+                sg.STREAM_RATES[2],
+                traceDataSize,
+                self.genChannelNumber()
+            )
+            ev = se.event(
+                traceStartTime - self.startTime,
+                id(self),
+                sg.EVENT_USER_REQUEST,
+                self
+            )
+        self.pendingRequests[ev.eid] = futureRequest
         return ev
 
     def getNoiseEvent(self, curTime):
+        if self.workload is not None:
+            request = self.workload.popNoise()
+            if request is None:
+                return None
+            randStartTime, futureNoiseRequest = request
+        else:
+            randHost = self.hostRanges.sample(sg.random)
+            randStartTime = curTime + sg.numpy.random.\
+                standard_gamma(sg.MEAN_PBK_TIME/self.activeNoiseStreamsMax)
+            randPlayTime = sg.numpy.random.triangular(600, 1800, 3600)
+            randStreamRate = sg.STREAM_RATES[int(
+                sg.numpy.random.triangular(
+                    -1, len(sg.STREAM_RATES) / 2, len(sg.STREAM_RATES)
+                ))]
+            # the server AS is drawn when the request arrives
+            futureNoiseRequest = \
+                (randHost, randStreamRate, randPlayTime * randStreamRate, None)
         self.totalNoiseStreams += 1
-        randHost = sg.random.choice(self.listOfHosts).exploded
-        randStartTime = curTime + sg.numpy.random.\
-            standard_gamma(sg.MEAN_PBK_TIME/self.activeNoiseStreamsMax)
-        randPlayTime = sg.numpy.random.triangular(600, 1800, 3600)
-        randStreamRate = sg.STREAM_RATES[int(
-            sg.numpy.random.triangular(
-                -1, len(sg.STREAM_RATES) / 2, len(sg.STREAM_RATES)
-            ))]
-        futureNoiseRequest = \
-            (randHost, randStreamRate, randPlayTime * randStreamRate)
-        self.noiseRequestQueue.put(futureNoiseRequest)
         ev = se.event(
             randStartTime,
             id(self),
             sg.EVENT_NOISE_USER_REQUEST,
             self
         )
+        self.pendingRequests[ev.eid] = futureNoiseRequest
         return ev
 
-    def routeStreamPath(self, path, s, curTime):
-        nodeA = path[0]
-        as_nodeA = sg.gnGraph.netGraph.node[nodeA]
-        for nodeB in path[1:]:
-            as_nodeB = sg.gnGraph.netGraph.node[nodeB]
-            link_AB = sg.gnGraph.netGraph[nodeA][nodeB]
-            if 'p2p_link' not in link_AB:
-                if sg.gnGraph.isAccessNode(
-                        as_nodeA['type']
-                ) or sg.gnGraph.isAccessNode(
-                        as_nodeB['type']
-                ):
-                    link_AB['p2p_link'] = \
-                        nl.netLink(
-                            sg.BACKBONE_LINK_BANDWIDTH,
-                            nodeA,
-                            nodeB
-                        )
-                else:
-                    link_AB['p2p_link'] = \
-                        nl.netLink(
-                            sg.FAST_BACKBONE_LINK_BANDWIDTH,
-                            nodeA,
-                            nodeB
-                        )
-            s.links.append(link_AB['p2p_link'])
-            nodeA = nodeB
-            as_nodeA = sg.gnGraph.netGraph.node[nodeA]
+    def routeStreamPath(self, path, links, s, curTime):
+        s.links.extend(links)
         if s.streamType == sg.STREAM_NOISE and not sg.simRef.simulatorReady:
             for l in s.links:
-                l.netDataStreams.append(s)
+                l.attachStream(s)
             self.initStreamsList.append(s)
         else:
             sg.simRef.eventPush(
@@ -266,24 +281,12 @@ class userRequests:
         return
 
     def addCacheToAS(self, ASn, curTime, channelNum, static=False):
-        thisAS = sg.gnGraph.netGraph.node[ASn]
-        if 'caches' not in thisAS:
-            thisAS['caches'] = [None] * sg.NUMBER_CHANNELS
-            thisAS['stats_maxConnections'] = 0
-            thisAS['stats_maxThroughput'] = 0.0
-            thisAS['stats_max_NumVMs'] = 0
-            thisAS['cur_Connections'] = 0
-            thisAS['cur_Throughput'] = 0.0
-            thisAS['cur_NumVMs'] = 0
-            # 1 vm per channel (all str.Rates)
-        if thisAS['caches'][channelNum] is None:
-            cache = cn.cacheNode(ASn)
-            thisAS['cur_NumVMs'] += 1
-            if thisAS['cur_NumVMs'] > thisAS['stats_max_NumVMs']:
-                thisAS['stats_max_NumVMs'] = thisAS['cur_NumVMs']
-            assert cache.id not in sg.gnGraph.netGraph
-            sg.gnGraph.netGraph.add_edge(ASn, cache.id)
-            thisAS['caches'][channelNum] = cache
+        # 1 vm per channel (all str.Rates)
+        cache = self.caches.get(ASn, channelNum)
+        if cache is None:
+            cache = cn.cacheNode(ASn, channelNum)
+            self.asStats.addVM(cache.asIdx)
+            self.caches.add(ASn, channelNum, cache)
             if static:
                 cache.process(
                     se.event(
@@ -302,49 +305,22 @@ class userRequests:
                         cache
                     )
                 )
-        else:
-            cache = thisAS['caches'][channelNum]
         return cache
 
-    def routeStreamPath_inclCache(self, path, s, curTime, first=True):
+    def routeStreamPath_inclCache(self, path, links, s, curTime, first=True):
         cacheOnDemand = sg.args.ondemandCache
+        asIndex = sg.gnGraph.asIndex
+        asHasStaticCache = sg.gnGraph.asHasStaticCache
         nodeA = path[0]
-        as_nodeA = sg.gnGraph.netGraph.node[nodeA]
-        for nodeB in path[1:]:
-            link_AB = sg.gnGraph.netGraph[nodeA][nodeB]
-            # Creating a link between node A and B, if it does not exist yet
-            if 'p2p_link' not in link_AB:
-                # if one of the nodes is an 'access' AS node then the link
-                # speed is set to BACKBONE_LINK_BANDWIDTH
-                if sg.gnGraph.isAccessNode(
-                        as_nodeA['type']
-                ) or sg.gnGraph.isAccessNode(
-                    sg.gnGraph.netGraph.node[nodeB]['type']
-                ):
-                    link_AB['p2p_link'] = \
-                        nl.netLink(
-                            sg.BACKBONE_LINK_BANDWIDTH,
-                            nodeA,
-                            nodeB
-                        )
-                else:
-                    link_AB['p2p_link'] = \
-                        nl.netLink(
-                            sg.FAST_BACKBONE_LINK_BANDWIDTH,
-                            nodeA,
-                            nodeB
-                        )
+        for nodeB, link_AB in zip(path[1:], links):
             if nodeA == path[0] or not sg.LOCAL_CACHE_ONLY:
                 # increase the cache-init counter and check the threshold
-                if 'nCacheRequests' not in as_nodeA:
-                    as_nodeA['nCacheRequests'] = [0] * sg.NUMBER_CHANNELS
-                as_nodeA['nCacheRequests'][s.channel] += 1
-                if as_nodeA['nCacheRequests'][s.channel] >= \
+                if self.caches.countRequest(nodeA, s.channel) >= \
                         sg.args.cachethreshold:
                     # threshold passed, add a cache
                     # (all checks are inside the 'addCacheToAS')
                     cache = None
-                    if 'static_cache' in as_nodeA:
+                    if asHasStaticCache[asIndex[nodeA]]:
                         cache = self.addCacheToAS(
                             nodeA,
                             curTime,
@@ -365,14 +341,13 @@ class userRequests:
                 # add the link from node A to node B to the stream path
                 # (! this does not mean adding stream to all links along
                 # the path, this is done later)
-                s.links.append(link_AB['p2p_link'])
+                s.links.append(link_AB)
             nodeA = nodeB
-            as_nodeA = sg.gnGraph.netGraph.node[nodeA]
         # background noise streams: adding stream to all links along
         # the path at init time
         if not sg.simRef.simulatorReady and s.streamType == sg.STREAM_NOISE:
             for l in s.links:
-                l.netDataStreams.append(s)
+                l.attachStream(s)
             self.initStreamsList.append(s)
         else:
             # schedule 'start streaming' events
@@ -389,38 +364,45 @@ class userRequests:
 
     def process(self, ev):
         if ev.type == sg.EVENT_USER_REQUEST:
-            dest_ip, stream_rate, data_size = self.requestQueue.get()
+            dest_ip, stream_rate, data_size, channel = \
+                self.pendingRequests.pop(ev.eid)
             hostAs = sg.gnGraph.ip2as[dest_ip]
-            path = networkx.shortest_path(
-                sg.gnGraph.netGraph,
+            path, links = sg.gnGraph.routes.getRoute(
                 hostAs,
                 sg.gnGraph.contentProvider
             )
-            serv_ip = sg.gnGraph.netGraph.node[sg.gnGraph.contentProvider]['ip'].exploded
+            serv_ip = sg.gnGraph.providerIP
             ds = ns.netDataStream(
                 stream_rate,
                 serv_ip,
                 dest_ip,
                 data_size,
-                self.genChannelNumber()
+                channel
             )
             ds.bufferingBegin = ev.time
             if sg.args.streaming:
-                self.routeStreamPath_inclCache(path, ds, ev.time)
+                self.routeStreamPath_inclCache(path, links, ds, ev.time)
             else:
-                self.routeStreamPath(path, ds, ev.time)
+                self.routeStreamPath(path, links, ds, ev.time)
             # statistics for user request
             ds.stats_events.append((ev.time, ev.type))
             self.activeStreams += 1
             self.numRequestsPerTimePeriod += 1
             if self.streamGenActive:
-                sg.simRef.eventPush(self.getNextEvent(ev.time))
+                nextEv = self.getNextEvent(ev.time)
+                if nextEv is not None:
+                    sg.simRef.eventPush(nextEv)
         elif ev.type == sg.EVENT_NOISE_USER_REQUEST:
-            dest_ip, stream_rate, data_size = self.noiseRequestQueue.get()
+            dest_ip, stream_rate, data_size, servAs = \
+                self.pendingRequests.pop(ev.eid)
+            if servAs is None:
+                servAs = sg.random.choice(sg.gnGraph.contentNodes)
+            if self.workloadLog is not None:
+                self.workloadLog.addNoise(
+                    ev.time, (dest_ip, stream_rate, data_size, servAs))
             hostAs = sg.gnGraph.ip2as[dest_ip]
-            servAs = sg.random.choice(sg.gnGraph.contentNodes)
-            serv_ip = sg.gnGraph.as2ip[servAs][0][1].exploded
-            path = networkx.shortest_path(sg.gnGraph.netGraph, hostAs, servAs)
+            serv_ip = sg.gnGraph.as2ip[servAs][0][0] + 1
+            path, links = sg.gnGraph.routes.getRoute(hostAs, servAs)
             ds = ns.netDataStream(
                 stream_rate,
                 serv_ip,
@@ -428,7 +410,7 @@ class userRequests:
                 data_size,
                 strType=sg.STREAM_NOISE
             )
-            self.routeStreamPath(path, ds, ev.time)
+            self.routeStreamPath(path, links, ds, ev.time)
             if sg.simRef.simulatorReady:
                 sg.simRef.eventPush(
                     se.event(
@@ -443,7 +425,9 @@ class userRequests:
             self.activeNoiseStreams += 1
             if not sg.simRef.simulationDone:
                 if not sg.simRef.simulatorReady:
-                    sg.simRef.eventPush(self.getNoiseEvent(ev.time))
+                    nextEv = self.getNoiseEvent(ev.time)
+                    if nextEv is not None:
+                        sg.simRef.eventPush(nextEv)
                     if self.activeNoiseStreams >= self.activeNoiseStreamsMax:
                         for tmpStream in self.initStreamsList:
                             tmpStream.startStreaming(ev.time)
@@ -452,16 +436,21 @@ class userRequests:
                         sg.simRef.simulatorReady = True
                         self.streamGenActive = True
                         # start normal stream
-                        sg.simRef.eventPush(self.getNextEvent(ev.time))
+                        nextEv = self.getNextEvent(ev.time)
+                        if nextEv is not None:
+                            sg.simRef.eventPush(nextEv)
         elif ev.type == sg.EVENT_CHANGE_REQUEST_RATE:
             self.streamGenerationRate = self.calcStreamGenRate(
                 self.streamGenRateScenario[self.streamGenRate_next][1]
             )
+            self.requestGen.setRate(self.streamGenerationRate)
             self.streamGenRate_next += 1
         elif ev.type == sg.EVENT_SIM_FINALIZE:
             printWithClock("Simulated: {:.1f}s.".format(float(ev.time)) +
                            " -- SIM_FINALIZE: no new streams", pre='\n')
             self.streamGenActive = False
+            if self.activeStreams == 0 and sg.simRef.simulatorReady:
+                sg.simRef.simulationDone = True
         elif ev.type == sg.EVENT_PERIODIC_STATS:
             sg.simRef.urStatistics_nActCons.append(
                 (ev.time, self.activeStreams)